@@ -1,11 +1,17 @@
 from expr import visit_expression, get_token
-from evaluate import static_evaluate
-from context import Context, ExtendedContext, Scope, Symbol
+from evaluate import static_evaluate, fold_stats
+from results import node_results
+from profiler import profiler
+from stub import stub_module, StubEvaluator, StubClassEvaluator
+from context import Context, ExtendedContext, Scope, Symbol, ChainedScope, \
+    lookup_stats
 from type_objects import NoneType, Bool, Num, Str, List, Dict, \
     Tuple, Instance, Class, Function, Maybe, Unknown, Union, BaseTuple, Set
 from util import type_subset, known_types, unify_types, UnknownValue, \
-    unifiable_types, comparable_types, type_intersection, type_patterns
+    unifiable_types, comparable_types, type_intersection, type_patterns, \
+    lattice_caches
 from inference import maybe_inferences
 from assign import assign
 from function import construct_function_type, FunctionSignature, \
-    FunctionEvaluator, ClassEvaluator
+    FunctionEvaluator, ClassEvaluator, evaluator_stats, \
+    declare_function_type, bind_method
@@ -1,7 +1,13 @@
 import copy
+from bisect import bisect_right
+from itertools import count
 from type_objects import NoneType, Bool
 from util import type_intersection, UnknownValue
 
+# how many constraints a recording keeps to replay on each context before
+# it depends on the values the constraints had when it started instead
+CONSTRAINT_STEPS = 1024
+
 # Tricky: need to support obj1.obj2.x where obj2 is an instance
 # of a class that may not be defined in the current scope
 # Idea: maintain a separate scope dict that contains all the class
@@ -17,6 +23,211 @@ from util import type_intersection, UnknownValue
 # but not the other way around.
 
 
+_clock = count()       # orders the creation and modification of scopes
+_recordings = []
+_absent = object()      # stands for a constraint that has not been added
+# disjoint spans of the clock, from the creation of a scope or context to a
+# modification of it, so results computed in between may be out of date
+_stale_starts = []
+_stale_ends = []
+# name -> clock reading when some scope last gained or lost the name, so a
+# name resolves to the same scope in a context until its reading changes
+_name_versions = {}
+
+lookup_stats = {'hits': 0, 'misses': 0}
+
+
+class Recording(object):
+    """ What an evaluation of a function body depended on: the scopes and
+        contexts it read that existed before it started, with their
+        versions at the time, and the constraints it found. It is pure if
+        it did not modify any scope that existed before it started.
+
+        Its effect on constraints is kept as the values of the constraints
+        it changed, which only hold for the same starting values, and as
+        the constraints it added, which can be added again to other
+        starting values. """
+    def __init__(self, owner):
+        self.owner = owner
+        self.owners = set([id(owner)])  # owners of nested recordings too
+        self.start = next(_clock)
+        # (id, name) -> (Scope or Context, name, version), where the name
+        # is None for reads of the whole object
+        self.reads = {}
+        # id(context) -> [context, cleared, {name: value at start}, results,
+        #                 [(name, type) added] or None if there were too many]
+        self.constraints = {}
+        self.pure = True
+
+    def read(self, obj, version, name=None):
+        if obj._created < self.start:
+            key = (id(obj), name)
+            if self.reads.setdefault(key, (obj, name, version))[2] != version:
+                self.pure = False   # it saw two versions of the same object
+
+    def _entry(self, context):
+        return self.constraints.setdefault(id(context),
+                                           [context, False, {}, None, []])
+
+    def constrain(self, context, name, type_):
+        self._depend(context, name, context._constraints.get(name, _absent))
+        self._add_steps(context, [(name, type_)])
+
+    def _depend(self, context, name, value):
+        entry = self._entry(context)
+        if not entry[1] and name not in entry[2]:
+            entry[2][name] = value
+
+    def _add_steps(self, context, steps):
+        """ Adding a constraint that was already added doesn't narrow it
+            any further, so each one is kept once. """
+        entry = self._entry(context)
+        if entry[1] or entry[4] is None:
+            return
+        if steps is None:
+            entry[4] = None
+            return
+        for step in steps:
+            if step not in entry[4]:
+                if len(entry[4]) >= CONSTRAINT_STEPS:
+                    entry[4] = None
+                    return
+                entry[4].append(step)
+
+    def clear(self, context):
+        entry = self._entry(context)
+        entry[1] = True
+        entry[2] = {}
+        entry[4] = []
+
+    def finish(self):
+        for entry in self.constraints.itervalues():
+            context, cleared, initial = entry[:3]
+            entry[3] = (dict(context._constraints) if cleared else
+                        dict((name, context._constraints[name])
+                             for name in initial))
+
+    def include(self, other):
+        self.owners.update(other.owners)
+        for obj, name, version in other.reads.itervalues():
+            self.read(obj, version, name)
+        for context, cleared, initial, _, steps in \
+                other.constraints.itervalues():
+            if cleared:
+                self.clear(context)
+            for name, value in initial.iteritems():
+                self._depend(context, name, value)
+            self._add_steps(context, steps)
+
+    def valid(self):
+        if not all(obj._version_of(name) == version
+                   for obj, name, version in self.reads.itervalues()):
+            return False
+        for context, _, initial, _, steps in self.constraints.itervalues():
+            if steps is None and not _same_constraints(context, initial):
+                return False
+        return True
+
+
+def _same_constraints(context, values):
+    for name, value in values.iteritems():
+        current = context._constraints.get(name, _absent)
+        if current is not value and current != value:
+            return False
+    return True
+
+
+def begin_recording(owner):
+    recording = Recording(owner)
+    _recordings.append(recording)
+    return recording
+
+
+def end_recording():
+    recording = _recordings.pop()
+    recording.finish()
+    if len(_recordings) > 0:
+        _recordings[-1].include(recording)
+    return recording
+
+
+def replay_recording(recording):
+    """ Apply the effects of a valid recording again instead of evaluating
+        the function body that it was recorded from. """
+    if len(_recordings) > 0:
+        _recordings[-1].include(recording)
+    for context, cleared, initial, results, steps in \
+            recording.constraints.itervalues():
+        if cleared:
+            _mark_stale(context._created, next(_clock))
+            context._constraints = dict(results)
+        elif _same_constraints(context, initial):
+            context._constraints.update(results)
+        else:
+            for name, type_ in steps:
+                context._narrow(name, type_)
+
+
+def recording_owners():
+    return set(id(recording.owner) for recording in _recordings)
+
+
+def interrupt_recordings(owner):
+    """ The recordings nested in the recording of owner depend on owner
+        being in progress, so they can't be reused. """
+    for recording in reversed(_recordings):
+        if recording.owner is owner:
+            break
+        recording.pure = False
+
+
+def current_recording():
+    return _recordings[-1] if len(_recordings) > 0 else None
+
+
+def _modified(obj):
+    obj._version = next(_clock)
+    _mark_stale(obj._created, obj._version)
+    for recording in reversed(_recordings):
+        if recording.start < obj._created:
+            break
+        recording.pure = False
+
+
+def _renamed(names):
+    for name in names:
+        _name_versions[name] = next(_clock)
+
+
+def _mark_stale(created, now):
+    while len(_stale_ends) > 0 and _stale_ends[-1] > created:
+        _stale_ends.pop()
+        created = min(created, _stale_starts.pop())
+    _stale_starts.append(created)
+    _stale_ends.append(now)
+
+
+def clock_stamp():
+    return next(_clock)
+
+
+def unchanged_since(stamp):
+    """ Whether no scope or constraints that existed at the time of the
+        stamp have been modified since. """
+    index = bisect_right(_stale_starts, stamp) - 1
+    return index < 0 or _stale_ends[index] < stamp
+
+
+def stale_spans():
+    return len(_stale_starts)
+
+
+def forget_stale():
+    """ Only for when no stamps are kept anymore. """
+    del _stale_starts[:]
+    del _stale_ends[:]
+
+
 def builtin_scope():
     scope = Scope()
     scope.add(Symbol('None', NoneType(), None))
@@ -26,6 +237,8 @@ def builtin_scope():
 
 
 class Symbol(object):
+    __slots__ = ('_name', '_type', '_value', '_assign_expression')
+
     def __init__(self, name, type_=None, value=UnknownValue(),
                  assign_expression=None):
         assert name is not None
@@ -37,7 +250,7 @@ class Symbol(object):
         self.assign(name, type_, value, assign_expression)
 
     def assign(self, name, type_, value, assign_expression):
-        self._name = name
+        self._name = intern(name)
         self._type = type_
         self._value = value if type_ != NoneType() else None
         self._assign_expression = assign_expression
@@ -58,9 +271,17 @@ class Symbol(object):
 
 
 class Scope(object):
+    __slots__ = ('_symbols', '_return', '_frozen', '_created', '_version',
+                 '_stamps')
+
     def __init__(self, init_dict=None):
         self._symbols = {}
         self._return = None
+        self._frozen = False
+        self._created = self._version = next(_clock)
+        # name -> version of the scope when the name was last added,
+        # replaced or removed, so reads of one name don't depend on others
+        self._stamps = {}
         if init_dict is not None:
             for name, type_ in init_dict.iteritems():
                 self.add(Symbol(name, type_, UnknownValue()))
@@ -68,13 +289,31 @@ class Scope(object):
     def __hash__(self):
         return hash(frozenset(self._symbols.items())) + hash(self._return)
 
+    def __getstate__(self):
+        return self._symbols, self._return, self._frozen
+
+    def __setstate__(self, state):
+        self._symbols, self._return, self._frozen = state
+        self._created = self._version = next(_clock)
+        self._stamps = {}
+
+    def _version_of(self, name):
+        return self._version if name is None else self._stamps.get(name)
+
+    def _read(self, name=None):
+        if len(_recordings) > 0 and not self._frozen:
+            _recordings[-1].read(self, self._version_of(name), name)
+
     def names(self):
+        self._read()
         return self._symbols.keys()
 
     def symbols(self):
+        self._read()
         return copy.copy(self._symbols)
 
     def get(self, name):
+        self._read(name)
         return self._symbols.get(name)
 
     def get_type(self, name=None):
@@ -85,22 +324,45 @@ class Scope(object):
         symbol = self.get(name) if name else self.get_return()
         return symbol.get_value() if symbol else None
 
+    def freeze(self):
+        self._frozen = True
+
+    def _check_mutable(self):
+        if self._frozen:
+            raise RuntimeError('Cannot modify a frozen scope')
+        _modified(self)
+
     def add(self, symbol):
         assert isinstance(symbol, Symbol)
-        self._symbols[symbol.get_name()] = symbol
+        self._check_mutable()
+        name = symbol.get_name()
+        if name not in self._symbols:
+            _renamed([name])
+        self._symbols[name] = symbol
+        self._stamps[name] = self._version
 
     def remove(self, name):
+        self._check_mutable()
         del self._symbols[name]
+        self._stamps[name] = self._version
+        _renamed([name])
 
     def merge(self, scope):
         assert isinstance(scope, Scope)
-        self._symbols.update(scope.symbols())
+        self._check_mutable()
+        scope._read()
+        _renamed(name for name in scope._symbols if name not in self._symbols)
+        self._symbols.update(scope._symbols)
+        for name in scope._symbols:
+            self._stamps[name] = self._version
 
     def set_return(self, symbol):
         assert isinstance(symbol, Symbol)
+        self._check_mutable()
         self._return = symbol
 
     def get_return(self):
+        self._read()
         return self._return
 
     def __str__(self):
@@ -109,19 +371,136 @@ class Scope(object):
                           for name in sorted(self._symbols.keys())]) + end
 
     def __contains__(self, name):
+        self._read(name)
         return name in self._symbols
 
 
+class ChainedScope(Scope):
+    """ A scope that looks up the names it doesn't have in the attributes
+        of an instance, when they are first used. An importer's view of a
+        module adds its submodules to one of these, so that importing
+        "a.b.c" doesn't analyze a or a.b. """
+    __slots__ = ('base',)
+
+    def __init__(self, base):
+        super(ChainedScope, self).__init__()
+        self.base = base
+
+    def __getstate__(self):
+        return super(ChainedScope, self).__getstate__() + (self.base,)
+
+    def __setstate__(self, state):
+        super(ChainedScope, self).__setstate__(state[:3])
+        self.base = state[3]
+
+    def local_names(self):
+        return super(ChainedScope, self).names()
+
+    def get_local(self, name):
+        return super(ChainedScope, self).get(name)
+
+    def names(self):
+        return list(set(self.base.attributes.names()) |
+                    set(self.local_names()))
+
+    def symbols(self):
+        symbols = self.base.attributes.symbols()
+        symbols.update(super(ChainedScope, self).symbols())
+        return symbols
+
+    def get(self, name):
+        symbol = super(ChainedScope, self).get(name)
+        return symbol if symbol is not None else self.base.attributes.get(name)
+
+    def __contains__(self, name):
+        return (super(ChainedScope, self).__contains__(name)
+                or name in self.base.attributes)
+
+
 class Context(object):
     def __init__(self, layers=None):
         self._scope_layers = [builtin_scope()] if layers is None else layers
         self._constraints = {}
+        # the version identifies the list of layers, so ending a scope
+        # restores the version from before the scope began
+        self._created = self._version = next(_clock)
+        self._versions = []
+        # name -> [scope or None, name version, what finding it read,
+        #          the recording that last saw those reads]
+        self._resolved = {}
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_resolved'] = {}
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._created = self._version = next(_clock)
+        self._versions = [next(_clock) for _ in self._versions]
+        self._resolved = {}
+
+    def _version_of(self, name):
+        return self._version
+
+    def _read(self, name=None):
+        if len(_recordings) > 0:
+            recording = _recordings[-1]
+            # scopes that began during the recording are its own, so it
+            # depends on the version of the layers from before it started
+            version = self._version
+            for previous in reversed(self._versions):
+                if version < recording.start:
+                    break
+                version = previous
+            recording.read(self, version)
 
     def __str__(self):
         return '\n'.join([str(layer) for layer in self._scope_layers])
 
     def __contains__(self, name):
-        return any(name in scope for scope in self._scope_layers)
+        return self._lookup(name) is not None
+
+    def _entry(self, name):
+        entry = self._resolved.get(name)
+        if entry is None or entry[1] != _name_versions.get(name):
+            lookup_stats['misses'] += 1
+            version = _name_versions.get(name)
+            reads = []
+            scope = self._search(name, reads)
+            entry = [scope, version, tuple(reads), None]
+            self._resolved[name] = entry
+        else:
+            lookup_stats['hits'] += 1
+        return entry
+
+    def _search(self, name, reads):
+        reads.append((self, None))
+        for scope in reversed(self._scope_layers):
+            if not scope._frozen:
+                reads.append((scope, name))
+            if name in scope._symbols:
+                return scope
+        return None
+
+    def _lookup(self, name):
+        """ The scope that name resolves to, or None. Resolving a name
+            again reads the same contexts and scopes as the first time,
+            so recordings depend on them in the same way. """
+        entry = self._entry(name)
+        if len(_recordings) > 0 and entry[3] is not _recordings[-1]:
+            for obj, read_name in entry[2]:
+                obj._read(read_name)
+            entry[3] = _recordings[-1]
+        return entry[0]
+
+    def lookup_key(self):
+        """ What expressions are evaluated against: the context that keeps
+            the constraints, followed by the scope layers that are not
+            empty. Contexts that extend the same context have the same key
+            until something is added to them. """
+        return (self,) + tuple(scope for scope in self._scope_layers
+                               if scope._symbols or scope._return is not None)
 
     def copy(self):
         """This makes a copy that won't lose scope layers when the original
@@ -129,15 +508,27 @@ class Context(object):
         scope."""
         return Context([scope for scope in self._scope_layers])
 
+    def layers(self):
+        return list(self._scope_layers)
+
     def begin_scope(self, scope=None):
+        if scope is not None:
+            _renamed(scope._symbols)
         self._scope_layers.append(Scope() if scope is None else scope)
+        self._versions.append(self._version)
+        self._version = next(_clock)
 
     def end_scope(self):
         if len(self._scope_layers) <= 1:
             raise RuntimeError('Cannot close bottom scope layer')
-        return self._scope_layers.pop()
+        self._version = (self._versions.pop() if len(self._versions) > 0
+                         else next(_clock))
+        scope = self._scope_layers.pop()
+        _renamed(scope._symbols)
+        return scope
 
     def get_top_scope(self):
+        self._read()
         return self._scope_layers[-1]
 
     def add(self, symbol):
@@ -150,8 +541,8 @@ class Context(object):
             scope.remove(name)
 
     def get(self, name):
-        scope = self.find_scope(name)
-        return scope.get(name) if scope is not None else None
+        scope = self._lookup(name)
+        return scope._symbols.get(name) if scope is not None else None
 
     def get_type(self, name=None):
         symbol = self.get(name) if name else self.get_return()
@@ -167,12 +558,18 @@ class Context(object):
         self.get_top_scope().merge(scope)
 
     def find_scope(self, name):
+        self._read()
         for scope in reversed(self._scope_layers):
             if name in scope:
                 return scope
         return None
 
     def add_constraint(self, name, type_):
+        if len(_recordings) > 0:
+            _recordings[-1].constrain(self, name, type_)
+        self._narrow(name, type_)
+
+    def _narrow(self, name, type_):
         old_type = self._constraints.get(name, self.get_type(name))
         self._constraints[name] = (type_intersection(old_type, type_)
                                    if old_type is not None else type_)
@@ -182,6 +579,14 @@ class Context(object):
 
     def clear_constraints(self):
         self._constraints = {}
+        _mark_stale(self._created, next(_clock))
+        if len(_recordings) > 0:
+            _recordings[-1].clear(self)
+
+
+# the bottom layer of an ExtendedContext until something is added to it
+_unwritten = Scope()
+_unwritten.freeze()
 
 
 class ExtendedContext(Context):
@@ -189,8 +594,15 @@ class ExtendedContext(Context):
         but which extends a base context that you cannot modify. """
     def __init__(self, base_context):
         self._base_context = base_context
-        super(ExtendedContext, self).__init__([Scope()])
+        # most extensions are only read, so they share an empty bottom
+        # layer until they need their own
+        super(ExtendedContext, self).__init__([_unwritten])
 
+    def get_top_scope(self):
+        if self._scope_layers[-1]._frozen:
+            self._scope_layers[-1] = Scope()
+            _modified(self)
+        return super(ExtendedContext, self).get_top_scope()
 
     def add_constraint(self, name, type_):
         self._base_context.add_constraint(name, type_)
@@ -201,19 +613,22 @@ class ExtendedContext(Context):
     def get_constraints(self):
         return self._base_context.get_constraints()
 
-    def __contains__(self, name):
-        return (super(ExtendedContext, self).__contains__(name)
-                or (name in self._base_context))
+    def _search(self, name, reads):
+        scope = super(ExtendedContext, self)._search(name, reads)
+        if scope is not None:
+            return scope
+        # the base context remembers what it finds too
+        entry = self._base_context._entry(name)
+        reads.extend(entry[2])
+        return entry[0]
 
     def copy(self):
         raise RuntimeError('copy is not allowed on ' + self.__class__.__name__)
 
-    def get(self, name):
-        extended = super(ExtendedContext, self).get(name)
-        if extended is not None:
-            return extended
-        else:
-            return self._base_context.get(name)
+    def lookup_key(self):
+        return self._base_context.lookup_key() + tuple(
+            scope for scope in self._scope_layers
+            if scope._symbols or scope._return is not None)
 
     def __str__(self):
         extended = super(ExtendedContext, self).__str__()
@@ -1,8 +1,12 @@
 import expr
 from functools import partial
-from operators import get_operator_function
+from operators import get_operator_function, FoldBudgetExceeded
 from type_objects import Instance, Unknown
 from util import UnknownValue, comparable_types
+from results import node_results
+
+
+fold_stats = {'abandoned': 0}
 
 
 def get_token(node):
@@ -15,7 +19,10 @@ def operator_evaluate(operator, *args):
         raise RuntimeError('Unrecognized operator: ' + operator)
     try:
         return func(*args)
-    except (TypeError, ValueError):
+    except FoldBudgetExceeded:
+        fold_stats['abandoned'] += 1
+        return UnknownValue()
+    except (TypeError, ValueError, ArithmeticError):
         return UnknownValue()
 
 
@@ -37,52 +44,118 @@ def comparison_evaluate(operator, left, right):
 
 # try to evaluate an expression without executing
 def static_evaluate(node, context):
-    token = get_token(node)
+    evaluator = _static_evaluators.get(node.__class__.__name__)
+    if evaluator is None:
+        return UnknownValue()
+    if node.__class__.__name__ in expr.LEAF_TOKENS:
+        return evaluator(node, context)
+    return node_results.get('value', node, None, context,
+                            lambda: evaluator(node, context), _keep_value)
+
+
+def _keep_value(value):
+    return True
+
+
+_static_evaluators = {}     # node class name -> evaluator
+
+
+def static_evaluator(*tokens):
+    """ Registers a function that returns the value of the nodes with the
+        given class names, or UnknownValue. It is called with the node and
+        the context. """
+    def register(evaluator):
+        for token in tokens:
+            _static_evaluators[token] = evaluator
+        return evaluator
+    return register
+
+
+@static_evaluator('Num')
+def _evaluate_num(node, context):
+    return node.n
+
+
+@static_evaluator('Str')
+def _evaluate_str(node, context):
+    return node.s
+
+
+@static_evaluator('Name')
+def _evaluate_name(node, context):
+    symbol = context.get(node.id)
+    return symbol.get_value() if symbol else UnknownValue()
+
+
+@static_evaluator('BoolOp')
+def _evaluate_bool_op(node, context):
+    values = [static_evaluate(value, context) for value in node.values]
+    return operator_evaluate(get_token(node.op), *values)
+
+
+@static_evaluator('UnaryOp')
+def _evaluate_unary_op(node, context):
+    return operator_evaluate(get_token(node.op),
+                             static_evaluate(node.operand, context))
+
+
+@static_evaluator('BinOp')
+def _evaluate_bin_op(node, context):
+    return operator_evaluate(get_token(node.op),
+                             static_evaluate(node.left, context),
+                             static_evaluate(node.right, context))
+
+
+@static_evaluator('Compare')
+def _evaluate_compare(node, context):
     recur = partial(static_evaluate, context=context)
-    if token == 'Num':
-        return node.n
-    if token == 'Str':
-        return node.s
-    if token == 'Name':
-        symbol = context.get(node.id)
+    operands = [node.left] + node.comparators
+    operators = map(get_token, node.ops)
+    assert len(operands) == len(operators) + 1
+    values = map(recur, operands)
+    types = map(partial(expr.expression_type, context=context), operands)
+    params = zip(values, types)
+    results = [comparison_evaluate(operators[i], params[i], params[i+1])
+               for i in range(len(operators))]
+    return operator_evaluate('And', *results)
+
+
+@static_evaluator('List')
+def _evaluate_list(node, context):
+    return [static_evaluate(elt, context) for elt in node.elts]
+
+
+@static_evaluator('Set')
+def _evaluate_set(node, context):
+    return set(static_evaluate(elt, context) for elt in node.elts)
+
+
+@static_evaluator('Dict')
+def _evaluate_dict(node, context):
+    recur = partial(static_evaluate, context=context)
+    return dict(zip(map(recur, node.keys), map(recur, node.values)))
+
+
+@static_evaluator('Tuple')
+def _evaluate_tuple(node, context):
+    return tuple(static_evaluate(elt, context) for elt in node.elts)
+
+
+@static_evaluator('IfExp')
+def _evaluate_if_exp(node, context):
+    test = static_evaluate(node.test, context)
+    if test is True:
+        return static_evaluate(node.body, context)
+    if test is False:
+        return static_evaluate(node.orelse, context)
+    return UnknownValue()
+
+
+@static_evaluator('Attribute')
+def _evaluate_attribute(node, context):
+    value_type = expr.expression_type(node.value, context)
+    if isinstance(value_type, Instance):
+        # pylint: disable=maybe-no-member
+        symbol = value_type.attributes.get(node.attr)
         return symbol.get_value() if symbol else UnknownValue()
-    if token == 'BoolOp':
-        operator = get_token(node.op)
-        return operator_evaluate(operator, *map(recur, node.values))
-    if token == 'UnaryOp':
-        operator = get_token(node.op)
-        return operator_evaluate(operator, recur(node.operand))
-    if token == 'BinOp':
-        operator = get_token(node.op)
-        return operator_evaluate(operator, recur(node.left), recur(node.right))
-    if token == 'Compare':
-        operands = [node.left] + node.comparators
-        operators = map(get_token, node.ops)
-        assert len(operands) == len(operators) + 1
-        values = map(recur, operands)
-        types = map(partial(expr.expression_type, context=context), operands)
-        params = zip(values, types)
-        results = [comparison_evaluate(operators[i], params[i], params[i+1])
-                   for i in range(len(operators))]
-        return operator_evaluate('And', *results)
-    if token == 'List':
-        return list(map(recur, node.elts))
-    if token == 'Set':
-        return set(map(recur, node.elts))
-    if token == 'Dict':
-        return dict(zip(map(recur, node.keys), map(recur, node.values)))
-    if token == 'Tuple':
-        return tuple(map(recur, node.elts))
-    if token == 'IfExp':
-        test = recur(node.test)
-        if test is True:
-            return recur(node.body)
-        if test is False:
-            return recur(node.orelse)
-    if token == 'Attribute':
-        value_type = expr.expression_type(node.value, context)
-        if isinstance(value_type, Instance):
-            # pylint: disable=maybe-no-member
-            symbol = value_type.attributes.get(node.attr)
-            return symbol.get_value() if symbol else UnknownValue()
     return UnknownValue()
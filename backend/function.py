@@ -1,9 +1,24 @@
 import expr
-from itertools import repeat
-from context import Symbol, Scope
-from type_objects import List, Dict, Unknown, Function, NoneType, Instance
+from itertools import count
+from context import Symbol, Scope, begin_recording, end_recording, \
+    replay_recording, recording_owners, interrupt_recordings
+from type_objects import List, Dict, Unknown, Function, NoneType, Instance, \
+    Class
 from util import type_intersection
 from evaluate import UnknownValue
+from profiler import profiler
+
+
+evaluator_stats = {'hits': 0, 'misses': 0}
+
+# maximum number of calls summarized by each function, since the
+# evaluators of builtins live as long as the process
+SUMMARY_CACHE_SIZE = 32
+
+_clock = count()     # orders the uses of summaries
+
+# calls with an argument value whose repr is longer are not summarized
+KEY_VALUE_LENGTH = 256
 
 
 def get_token(node):
@@ -94,7 +109,8 @@ class FunctionSignature(object):
                            if get_token(d) == 'Call' and d.func.id == 'types']
         return ([expr.expression_type(arg, context)
                  for arg in types_decorator[0].args]
-                if len(types_decorator) == 1 else repeat(Unknown()))
+                if len(types_decorator) == 1
+                else [Unknown()] * len(self.names))
 
     def generic_scope(self):
         scope = Scope()
@@ -118,14 +134,63 @@ class FunctionSignature(object):
                           in zip(self.names, self.types)) + vararg + kwarg)
 
 
+def value_key(value):
+    """ The repr of a static value, or None if it is too long to be part
+        of a key. Sized values are measured first, so that a long one is
+        never converted to a string. """
+    if isinstance(value, UnknownValue):
+        return 'UnknownValue'
+    if hasattr(value, '__len__') and len(value) > KEY_VALUE_LENGTH:
+        return None
+    text = repr(value)
+    return text if len(text) <= KEY_VALUE_LENGTH else None
+
+
+def argument_key(argument_scope):
+    """ None if the call should not be summarized. """
+    items = []
+    for name in sorted(argument_scope.names()):
+        symbol = argument_scope.get(name)
+        value = value_key(symbol.get_value())
+        if value is None:
+            return None
+        items.append((name, symbol.get_type(), value))
+    return tuple(items)
+
+
+def shareable_type(type_):
+    """ False if the type contains an Instance or Class, because a cached
+        result must not share those between callers. """
+    if isinstance(type_, (Instance, Class)):
+        return False
+    if isinstance(type_, Function):
+        return type_.instance is None and shareable_type(type_.return_type)
+    children = (getattr(type_, 'item_types', None)
+                or getattr(type_, 'subtypes', None)
+                or [getattr(type_, name) for name
+                    in ('item_type', 'key_type', 'value_type', 'subtype')
+                    if hasattr(type_, name)])
+    return all(shareable_type(child) for child in children)
+
+
 # we only generate warnings on the first pass through a function definition
 # the FunctionEvaluator is only to evaluate the type and static value of
 # function calls
 class FunctionEvaluator(object):
-    def __init__(self, body, visitor):
+    def __init__(self, body, visitor, label=None):
         self._body = body
         self._visitor = visitor
+        self.label = label      # names the function in profiles
         self._recursion_block = False
+        # argument key -> [return type, return value, Recording, last use]
+        self._summaries = {}
+        self.hits = 0
+        self.misses = 0
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_summaries'] = {}
+        return state
 
     def _evaluate(self, argument_scope):
         visitor = self._visitor
@@ -138,19 +203,68 @@ class FunctionEvaluator(object):
             visitor.visit(self._body)
         return visitor.end_scope()
 
+    def _summary(self, key):
+        summary = self._summaries.get(key)
+        if summary is None:
+            return None
+        if not summary[2].valid():
+            del self._summaries[key]
+            return None
+        summary[3] = next(_clock)
+        # a summary that called an evaluator that is now in progress
+        # would have been cut short by its recursion block
+        if not summary[2].owners.isdisjoint(recording_owners()):
+            return None
+        return summary
+
+    def _summarize(self, key, return_type, return_value, recording):
+        """ When there are SUMMARY_CACHE_SIZE summaries, the least recently
+            used half of them are forgotten. """
+        if len(self._summaries) >= SUMMARY_CACHE_SIZE:
+            by_use = sorted(self._summaries.iteritems(), key=lambda x: x[1][3])
+            for old_key, _ in by_use[:len(by_use) // 2]:
+                del self._summaries[old_key]
+        self._summaries[key] = [return_type, return_value, recording,
+                                next(_clock)]
+
     def evaluate(self, argument_scope):
         if self._recursion_block:
+            interrupt_recordings(self)
             return Unknown(), UnknownValue()
-        self._recursion_block = True
         if self._body is None:
             return NoneType(), None
-        scope = self._evaluate(argument_scope)
-        self._recursion_block = False
+        key = argument_key(argument_scope)
+        summary = self._summary(key) if key is not None else None
+        if summary is not None:
+            replay_recording(summary[2])
+            self.hits += 1
+            evaluator_stats['hits'] += 1
+            if profiler.enabled:
+                profiler.reuse('function', self.label)
+            return summary[0], summary[1]
+        self.misses += 1
+        evaluator_stats['misses'] += 1
+        # evaluators of builtins are shared by every analysis in the process,
+        # so an exception must not leave them blocked
+        self._recursion_block = True
+        begin_recording(self)
+        if profiler.enabled:
+            profiler.begin('function', self.label)
+        try:
+            scope = self._evaluate(argument_scope)
+        finally:
+            if profiler.enabled:
+                profiler.end()
+            self._recursion_block = False
+            recording = end_recording()
         return_type = scope.get_type() or NoneType()
         if return_type != NoneType():
             return_value = scope.get_value() or UnknownValue()
         else:
             return_value = None
+        if (key is not None and recording.pure
+                and shareable_type(return_type)):
+            self._summarize(key, return_type, return_value, recording)
         return return_type, return_value
 
 
@@ -158,19 +272,30 @@ class ClassEvaluator(object):
     def __init__(self, class_object):
         self._class_object = class_object
 
-    def evaluate(self, argument_scope):
-        # argument_scope does not contain "self" parameter at this point
-        # because we create the "self" instance inside this method
+    def instance(self):
+        """ A new instance with the methods of the class, before
+            __init__ has run. """
         instance = Instance(self._class_object.name, Scope())
         class_attributes = self._class_object.attributes
         for name in class_attributes.names():
             symbol_type = class_attributes.get_type(name)
             if isinstance(symbol_type, Function):
-                function_type = Function(
-                    symbol_type.signature,
-                    symbol_type.return_type,
-                    symbol_type.evaluator, instance)
-                instance.attributes.add(Symbol(name, function_type))
+                bind_method(instance, name, symbol_type)
+        return instance
+
+    def evaluate(self, argument_scope):
+        if not profiler.enabled:
+            return self._evaluate(argument_scope)
+        profiler.begin('class', self._class_object.name)
+        try:
+            return self._evaluate(argument_scope)
+        finally:
+            profiler.end()
+
+    def _evaluate(self, argument_scope):
+        # argument_scope does not contain "self" parameter at this point
+        # because we create the "self" instance inside this method
+        instance = self.instance()
 
         # Note: error checking for arguments passed in has already been
         # handled because the signature for the class object is loaded
@@ -184,17 +309,40 @@ class ClassEvaluator(object):
         return instance, UnknownValue()
 
 
+def bind_method(instance, name, function_type):
+    method_type = Function(function_type.signature, function_type.return_type,
+                           function_type.evaluator, instance)
+    instance.attributes.add(Symbol(name, method_type))
+
+
+def function_label(functiondef_node, visitor):
+    name = getattr(functiondef_node, 'name', None) or '<lambda>'
+    filepath = getattr(visitor, '_filepath', None) or '<unknown>'
+    return '{0} ({1}:{2})'.format(name, filepath, functiondef_node.lineno)
+
+
+def declare_function_type(functiondef_node, visitor):
+    """ The type of a function whose body has not been checked yet. """
+    signature = FunctionSignature(functiondef_node.name, functiondef_node.args,
+                                  visitor.context())
+    label = function_label(functiondef_node, visitor)
+    evaluator = FunctionEvaluator(functiondef_node.body, visitor.clone(),
+                                  label)
+    return Function(signature, Unknown(), evaluator)
+
+
 # problem: where are we going to check for errors in the function call?
 def construct_function_type(functiondef_node, visitor, instance=None):
     name = getattr(functiondef_node, 'name', None)
     signature = FunctionSignature(name, functiondef_node.args,
                                   visitor.context())
     body = functiondef_node.body
+    label = function_label(functiondef_node, visitor)
     first_visitor = (visitor if instance is None
                      or (name == '__init__' and not instance.initialized)
                      or (name != '__init__' and instance.initialized)
                      else visitor.clone())
-    first_evaluator = FunctionEvaluator(body, first_visitor)
+    first_evaluator = FunctionEvaluator(body, first_visitor, label)
     first_visitor.context().clear_constraints()
     argument_scope = signature.generic_scope()
     if instance is not None:
@@ -202,5 +350,5 @@ def construct_function_type(functiondef_node, visitor, instance=None):
         argument_scope.add(self_symbol)
     return_type, _ = first_evaluator.evaluate(argument_scope)
     signature.constrain_types(first_visitor.context().get_constraints())
-    evaluator = FunctionEvaluator(body, visitor.clone())
+    evaluator = FunctionEvaluator(body, visitor.clone(), label)
     return Function(signature, return_type, evaluator)
@@ -1,5 +1,7 @@
 import ast
-from evaluate import static_evaluate, UnknownValue
+import expr
+from evaluate import static_evaluate, UnknownValue, operator_evaluate, \
+    comparison_evaluate, get_token
 from type_objects import NoneType, Maybe
 from context import Symbol
 
@@ -19,28 +21,126 @@ def get_names(node):
     return visitor.names
 
 
+class Narrowing(object):
+    """ Evaluates a test with one of its names bound to another symbol.
+        The parts of the test that don't contain the name keep the value
+        and type they have without it, and And and Or keep counts of
+        their True and False operands, so binding each of the names in
+        turn takes time linear in the size of the test. """
+
+    def __init__(self, test, context, names):
+        self._context = context
+        self._names = {}        # node -> bindable names in it
+        self._operands = {}     # BoolOp node -> {name: operands with it}
+        self._values = {}       # node -> static value without a binding
+        self._types = {}        # node -> type without a binding
+        self._counts = {}       # BoolOp node -> (True operands, False ones)
+        self._collect(test, names)
+
+    def _collect(self, node, names):
+        found = set([node.id]) & names if isinstance(node, ast.Name) else set()
+        for child in ast.iter_child_nodes(node):
+            child_names = self._collect(child, names)
+            if isinstance(node, ast.BoolOp):
+                for name in child_names:
+                    self._operands.setdefault(node, {}).setdefault(
+                        name, []).append(child)
+            found |= child_names
+        self._names[node] = found
+        return found
+
+    def _value(self, node):
+        if node not in self._values:
+            self._values[node] = static_evaluate(node, self._context)
+        return self._values[node]
+
+    def _type(self, node):
+        if node not in self._types:
+            self._types[node] = expr.expression_type(node, self._context)
+        return self._types[node]
+
+    def _bound(self, function, node, symbol):
+        self._context.begin_scope()
+        self._context.add(symbol)
+        result = function(node, self._context)
+        self._context.end_scope()
+        return result
+
+    def value(self, node, symbol):
+        """ The static value of node with symbol bound. """
+        name = symbol.get_name()
+        if name not in self._names[node]:
+            return self._value(node)
+        token = get_token(node)
+        if token == 'Name':
+            return symbol.get_value()
+        if token == 'BoolOp':
+            return self._bool_op(node, symbol)
+        if token == 'UnaryOp':
+            return operator_evaluate(get_token(node.op),
+                                     self.value(node.operand, symbol))
+        if token == 'BinOp':
+            return operator_evaluate(get_token(node.op),
+                                     self.value(node.left, symbol),
+                                     self.value(node.right, symbol))
+        if token == 'Compare':
+            operands = [node.left] + node.comparators
+            params = [(self.value(operand, symbol),
+                       self.type(operand, symbol)) for operand in operands]
+            results = [comparison_evaluate(get_token(operator),
+                                           params[i], params[i + 1])
+                       for i, operator in enumerate(node.ops)]
+            return operator_evaluate('And', *results)
+        return self._bound(static_evaluate, node, symbol)
+
+    def type(self, node, symbol):
+        """ The type of node with symbol bound. """
+        if symbol.get_name() not in self._names[node]:
+            return self._type(node)
+        if isinstance(node, ast.Name):
+            return symbol.get_type()
+        return self._bound(expr.expression_type, node, symbol)
+
+    def _bool_op(self, node, symbol):
+        if node not in self._counts:
+            values = [self._value(operand) for operand in node.values]
+            self._counts[node] = (sum(1 for x in values if x is True),
+                                  sum(1 for x in values if x is False))
+        trues, falses = self._counts[node]
+        for operand in self._operands[node][symbol.get_name()]:
+            before = self._value(operand)
+            after = self.value(operand, symbol)
+            trues += (after is True) - (before is True)
+            falses += (after is False) - (before is False)
+        count = len(node.values)
+        if get_token(node.op) == 'And':
+            if trues == count:
+                return True
+            return False if falses > 0 else UnknownValue()
+        if trues > 0:
+            return True
+        return False if falses == count else UnknownValue()
+
+
 def maybe_inferences(test, context):
     types = {name: context.get_type(name) for name in get_names(test)}
     maybes = {k: v for k, v in types.items() if isinstance(v, Maybe)}
 
     if_inferences = {}
     else_inferences = {}
+    if len(maybes) == 0:
+        return if_inferences, else_inferences
+    narrowing = Narrowing(test, context, set(maybes))
     for name, maybe_type in maybes.items():
-        context.begin_scope()
-        context.add(Symbol(name, NoneType(), None))
-        none_value = static_evaluate(test, context)
-        context.end_scope()
+        none_value = narrowing.value(test, Symbol(name, NoneType(), None))
         if none_value is False:
             if_inferences[name] = maybe_type.subtype
         if none_value is True:
             else_inferences[name] = maybe_type.subtype
-        context.begin_scope()
-        context.add(Symbol(name, maybe_type.subtype, UnknownValue()))
-        non_none_value = static_evaluate(test, context)
-        context.end_scope()
+        non_none_value = narrowing.value(
+            test, Symbol(name, maybe_type.subtype, UnknownValue()))
         if non_none_value is False:
             if_inferences[name] = NoneType()
         if non_none_value is True:
             else_inferences[name] = NoneType()
     return if_inferences, else_inferences
-
@@ -1,7 +1,36 @@
+import re
 import operator
 from numbers import Number
 
 
+# constant folding computes real values, so a fold is abandoned if its
+# result would hold more bits than this, or more items or characters
+FOLD_BITS = 1 << 16
+FOLD_LENGTH = 1 << 16
+
+
+class FoldBudgetExceeded(Exception):
+    pass
+
+
+def _integer(value):
+    return isinstance(value, (int, long))
+
+
+def _sequence(value):
+    return isinstance(value, (basestring, list, tuple))
+
+
+def _check_bits(bits):
+    if bits > FOLD_BITS:
+        raise FoldBudgetExceeded()
+
+
+def _check_length(length):
+    if length > FOLD_LENGTH:
+        raise FoldBudgetExceeded()
+
+
 def and_operator(*values):
     if all(value is True for value in values):
         return True
@@ -19,10 +48,63 @@ def or_operator(*values):
 
 
 def add_operator(left, right):
+    if _sequence(left) and _sequence(right):
+        _check_length(len(left) + len(right))
     return left + right
 
 
+def mult_operator(left, right):
+    if _integer(left) and _integer(right):
+        _check_bits(left.bit_length() + right.bit_length())
+    elif _sequence(left) and _integer(right):
+        _check_length(len(left) * right)
+    elif _integer(left) and _sequence(right):
+        _check_length(left * len(right))
+    return left * right
+
+
+def pow_operator(left, right):
+    if _integer(left) and _integer(right) and abs(left) > 1 and right > 0:
+        _check_bits(left.bit_length() * right)
+    return left ** right
+
+
+def lshift_operator(left, right):
+    if _integer(left) and _integer(right) and left != 0 and right > 0:
+        _check_bits(left.bit_length() + right)
+    return left << right
+
+
+def repeat_operator(sequence, times):
+    if _sequence(sequence) and _integer(times):
+        _check_length(len(sequence) * times)
+    return operator.repeat(sequence, times)
+
+
+# the width and precision of each conversion of a format string
+_CONVERSION = re.compile(
+    r'%(?:%|(?:\([^)]*\))?[-#0 +]*(\*|\d*)(?:\.(\*|\d*))?)')
+
+
+def _format_length(template, arguments):
+    """ An upper bound on the padding that formatting adds. """
+    length = 0
+    for match in _CONVERSION.finditer(template):
+        for field in match.groups():
+            if field == '*':
+                items = arguments if isinstance(arguments, tuple) else ()
+                length += sum(abs(item) for item in items if _integer(item))
+            elif field:
+                length += int(field)
+    return length
+
+
 def mod_operator(left, right):
+    if isinstance(left, basestring):
+        _check_length(len(left) + _format_length(left, right))
+        result = left % right
+        _check_length(len(result))
+        return result
     return left % right
 
 
@@ -48,17 +130,17 @@ def get_operator_function(name):
         'BitXor': operator.xor,
         'Invert': operator.invert,
         'BitOr': operator.or_,
-        'Pow': operator.pow,
+        'Pow': pow_operator,
         'Is': operator.is_,
         'IsNot': operator.is_not,
-        'LShift': operator.lshift,
+        'LShift': lshift_operator,
         'Mod': mod_operator,
-        'Mult': operator.mul,
+        'Mult': mult_operator,
         'USub': operator.neg,
         'Not': operator.not_,
         'UAdd': operator.pos,
         'RShift': operator.rshift,
-        'Repeat': operator.repeat,  # special
+        'Repeat': repeat_operator,  # special
         'Sub': operator.sub,
         'Lt': comparison(operator.lt),
         'LtE': comparison(operator.le),
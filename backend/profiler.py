@@ -0,0 +1,68 @@
+from timeit import default_timer
+
+
+class Profiler(object):
+    """ Counts the evaluations of each function, class and module and the
+        time spent in them. The time of a nested evaluation counts toward
+        the cumulative time of every entry that encloses it, but only
+        toward the self time of the innermost one, and the cumulative time
+        of a recursive entry is only counted once. """
+
+    def __init__(self):
+        self.enabled = False
+        # (kind, label) -> [evaluations, reuses, cumulative, self time]
+        self._entries = {}
+        self._stack = []        # [key, start time, time of nested entries]
+        self._depths = {}       # key -> times it is on the stack
+
+    def _entry(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = self._entries[key] = [0, 0, 0.0, 0.0]
+        return entry
+
+    def reuse(self, kind, label):
+        """ Record that a summary was used instead of an evaluation. """
+        self._entry((kind, label))[1] += 1
+
+    def begin(self, kind, label):
+        key = (kind, label)
+        self._entry(key)[0] += 1
+        self._depths[key] = self._depths.get(key, 0) + 1
+        self._stack.append([key, default_timer(), 0.0])
+
+    def end(self):
+        key, start, nested = self._stack.pop()
+        elapsed = default_timer() - start
+        entry = self._entries[key]
+        self._depths[key] -= 1
+        if self._depths[key] == 0:
+            entry[2] += elapsed
+        entry[3] += elapsed - nested
+        if len(self._stack) > 0:
+            self._stack[-1][2] += elapsed
+
+    def hotspots(self):
+        """ (kind, label, evaluations, reuses, cumulative, self time) for
+            each entry, with the largest self time first. """
+        rows = [key + tuple(entry) for key, entry in self._entries.items()]
+        return sorted(rows, key=lambda row: (-row[5], row[1]))
+
+    def report(self, caches, limit=40):
+        """ caches is a list of (name, hits, misses). """
+        lines = ['{0:<8} {1:>7} {2:>7} {3:>10} {4:>10}  {5}'.format(
+            'kind', 'evals', 'reused', 'cum (ms)', 'self (ms)', 'name')]
+        for kind, label, count, reuses, total, own in self.hotspots()[:limit]:
+            lines.append('{0:<8} {1:7} {2:7} {3:10.1f} {4:10.1f}  {5}'.format(
+                kind, count, reuses, total * 1e3, own * 1e3, label))
+        lines.append('')
+        lines.append('{0:<24} {1:>9} {2:>9} {3:>9}'.format(
+            'cache', 'hits', 'misses', 'hit rate'))
+        for name, hits, misses in caches:
+            rate = float(hits) / (hits + misses) if hits + misses else 0.0
+            lines.append('{0:<24} {1:9} {2:9} {3:8.1f}%'.format(
+                name, hits, misses, rate * 100))
+        return '\n'.join(lines) + '\n'
+
+
+profiler = Profiler()
@@ -0,0 +1,62 @@
+from context import clock_stamp, unchanged_since, forget_stale, \
+    stale_spans, current_recording
+
+
+# the cache is emptied when it holds this many results
+RESULT_CACHE_SIZE = 100000
+
+
+class ResultCache(object):
+    """ Remembers the types and static values of expression nodes. A result
+        is stale once a scope or the constraints of a context that existed
+        when it was computed are modified, so binding a name that the
+        expression reads makes it stale. Types are only remembered from
+        visits that don't warn.
+
+        A result is only used by the function evaluation that computed it,
+        since that recorded what computing it read. """
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        # (kind, node, id(expected type), id(recording)) -> (result, stamp,
+        #     context, context version, ids of lookup key, objects to keep)
+        self._results = {}
+
+    def get(self, kind, node, expected_type, context, compute, keep):
+        """ compute() returns the result, and keep(result) tells whether
+            it may be shared by later evaluations of the node. """
+        recording = current_recording()
+        key = (kind, node, id(expected_type), id(recording))
+        entry = self._results.get(key)
+        if entry is not None and unchanged_since(entry[1]):
+            if entry[2] is context and entry[3] == context._version:
+                self.hits += 1
+                return entry[0]
+            # another context, such as another extension of the same one
+            lookup_key = context.lookup_key()
+            if entry[4] == tuple(id(x) for x in lookup_key):
+                self.hits += 1
+                return entry[0]
+        self.misses += 1
+        stamp = clock_stamp()
+        version = context._version
+        lookup_key = context.lookup_key()
+        result = compute()
+        if keep(result):
+            if (len(self._results) >= RESULT_CACHE_SIZE
+                    or stale_spans() >= RESULT_CACHE_SIZE):
+                self.clear()
+            # the entry keeps the objects that are keyed by id alive, so
+            # their ids stay unique
+            self._results[key] = (result, stamp, context, version,
+                                  tuple(id(x) for x in lookup_key),
+                                  (expected_type, recording, lookup_key))
+        return result
+
+    def clear(self):
+        self._results.clear()
+        forget_stale()
+
+
+node_results = ResultCache()
@@ -0,0 +1,142 @@
+from copy import copy
+from context import Symbol, Scope, ChainedScope
+from type_objects import Function, Class, Instance, NoneType, Unknown, \
+    InternedType
+from function import NullEvaluator, bind_method
+from evaluate import UnknownValue
+
+
+class StubEvaluator(object):
+    """ Evaluates calls to a function of an interface, whose body is not
+        available, to the return type it had when the interface was
+        written. """
+
+    def __init__(self, return_type):
+        self._return_type = return_type
+
+    def evaluate(self, argument_scope):
+        _ = argument_scope
+        if self._return_type == NoneType():
+            return self._return_type, None
+        return self._return_type, UnknownValue()
+
+
+class StubClassEvaluator(object):
+    """ Evaluates calls to a class of an interface to an instance with the
+        methods of the class and the attributes that __init__ added when
+        the interface was written. """
+
+    def __init__(self, class_object, layout):
+        self._class_object = class_object
+        self._layout = layout       # Scope of the attributes from __init__
+
+    def evaluate(self, argument_scope):
+        _ = argument_scope
+        instance = Instance(self._class_object.name, Scope())
+        class_attributes = self._class_object.attributes
+        for name in class_attributes.names():
+            symbol_type = class_attributes.get_type(name)
+            if isinstance(symbol_type, Function):
+                bind_method(instance, name, symbol_type)
+        instance.attributes.merge(self._layout)
+        instance.initialized = True
+        return instance, UnknownValue()
+
+
+class Stubber(object):
+    """ Copies types, replacing the evaluators of functions and classes
+        with stubs, so that the copies don't keep function bodies or the
+        contexts they were defined in. Objects whose ids are in keep are
+        not copied, such as the modules that a module imports. """
+
+    def __init__(self, keep):
+        self._keep = keep
+        self._copies = {}       # id(original) -> copy
+
+    def scope(self, scope):
+        if id(scope) in self._keep:
+            return scope
+        if isinstance(scope, ChainedScope):
+            # the modules it chains to are kept, and aren't analyzed here
+            result = ChainedScope(self.type(scope.base))
+            names = scope.local_names()
+        else:
+            result = Scope()
+            names = scope.names()
+        for name in names:
+            symbol = scope.get(name)
+            result.add(Symbol(name, self.type(symbol.get_type()),
+                              symbol.get_value()))
+        return result
+
+    def type(self, type_):
+        if isinstance(type_, InternedType):
+            if type_._static:
+                return type_
+            constructor, (cls, components) = type_.__reduce__()
+            return constructor(cls, tuple(
+                tuple(self.type(x) for x in component)
+                if isinstance(component, tuple) else self.type(component)
+                for component in components))
+        if id(type_) in self._keep:
+            return type_
+        if id(type_) in self._copies:
+            return self._copies[id(type_)]
+        if isinstance(type_, Function):
+            return self._function(type_)
+        if isinstance(type_, Class):
+            return self._class(type_)
+        if isinstance(type_, Instance):
+            return self._instance(type_)
+        return type_
+
+    def _signature(self, signature):
+        result = copy(signature)
+        result.types = [self.type(x) for x in signature.types]
+        result.default_types = [self.type(x)
+                                for x in signature.default_types]
+        result.annotated_types = [self.type(x)
+                                  for x in signature.annotated_types]
+        return result
+
+    def _function(self, function):
+        result = Function(None, Unknown(), NullEvaluator())
+        self._copies[id(function)] = result
+        result.signature = self._signature(function.signature)
+        result.return_type = self.type(function.return_type)
+        result.evaluator = StubEvaluator(result.return_type)
+        if function.instance is not None:
+            result.instance = self.type(function.instance)
+        return result
+
+    def _class(self, class_type):
+        result = Class(class_type.name, None, Unknown(), None, None)
+        self._copies[id(class_type)] = result
+        result.signature = self._signature(class_type.signature)
+        result.return_type = self.type(class_type.return_type)
+        result.attributes = self.scope(class_type.attributes)
+        # the attributes that __init__ adds to an instance
+        instance, _ = class_type.evaluator.evaluate(
+            class_type.signature.generic_scope())
+        layout = Scope()
+        for name in instance.attributes.names():
+            if name not in class_type.attributes:
+                symbol = instance.attributes.get(name)
+                layout.add(Symbol(name, self.type(symbol.get_type()),
+                                  symbol.get_value()))
+        result.evaluator = StubClassEvaluator(result, layout)
+        return result
+
+    def _instance(self, instance):
+        result = Instance(instance.class_name, Scope())
+        self._copies[id(instance)] = result
+        result.initialized = instance.initialized
+        result.attributes = self.scope(instance.attributes)
+        return result
+
+
+def stub_module(module, keep=()):
+    """ The interface of a module Instance: its attributes with stubs in
+        place of function bodies. """
+    stubber = Stubber(set(keep))
+    return Instance(module.class_name, stubber.scope(module.attributes))
@@ -1,4 +1,8 @@
 
+from weakref import ref
+from functools import partial
+
+
 class EqualityMixin(object):
     def __eq__(self, other):
         return (isinstance(other, self.__class__)
@@ -12,16 +16,22 @@ class EqualityMixin(object):
 
 
 class BasicMixin(object):
+    __slots__ = ()
+
     def __str__(self):
         return self.__class__.__name__
 
 
 class ItemTypeMixin(object):
+    __slots__ = ()
+
     def __str__(self):
         return '{0}({1})'.format(self.__class__.__name__, str(self.item_type))
 
 
 class TupleMixin(object):
+    __slots__ = ()
+
     def __str__(self):
         return '{0}({1})'.format(self.__class__.__name__,
                                  ','.join([str(x) for x in self.item_types]))
@@ -33,65 +43,157 @@ class CallableMixin(object):
                                         self.signature, self.return_type)
 
 
-class Unknown(EqualityMixin, BasicMixin):
+_interned = {}      # (class, components) -> weak reference to type
+_nullary = {}       # class -> type, for types without components
+
+
+def _key(component):
+    # functions, classes and instances are mutable, so they are keyed by
+    # identity; the interned type keeps them alive
+    if isinstance(component, InternedType):
+        return component
+    elif isinstance(component, tuple):
+        return tuple(_key(x) for x in component)
+    else:
+        return id(component)
+
+
+def _static(component):
+    if isinstance(component, InternedType):
+        return component._static
+    elif isinstance(component, tuple):
+        return all(_static(x) for x in component)
+    else:
+        return False
+
+
+def _forget(key, reference):
+    if _interned.get(key) is reference:
+        del _interned[key]
+
+
+def _intern(cls, components):
+    if len(components) == 0 and cls in _nullary:
+        return _nullary[cls]
+    key = (cls,) + tuple(_key(x) for x in components)
+    reference = _interned.get(key)
+    type_ = reference() if reference is not None else None
+    if type_ is None:
+        type_ = object.__new__(cls)
+        for field, component in zip(cls.FIELDS, components):
+            object.__setattr__(type_, field, component)
+        # same hash as before types were interned, so that iterating over
+        # sets of types gives the same order
+        object.__setattr__(type_, '_hash', hash(str(type_)))
+        # whether the type contains no functions, classes or instances
+        object.__setattr__(type_, '_static', _static(components))
+        _interned[key] = ref(type_, partial(_forget, key))
+        if len(components) == 0:
+            _nullary[cls] = type_
+    return type_
+
+
+class InternedType(object):
+    """ Types other than functions, classes and instances are immutable and
+        interned: constructing a type that is equal to an existing one
+        returns the existing object, so equality is identity. """
+    __slots__ = ('_hash', '_static', '__weakref__')
+    FIELDS = ()
+
+    def __new__(cls, *args):
+        if len(args) == 0 and cls in _nullary:
+            return _nullary[cls]
+        return _intern(cls, cls.components(*args))
+
+    @classmethod
+    def components(cls, *args):
+        return args
+
+    def __hash__(self):
+        return self._hash
+
+    def __setattr__(self, name, value):
+        raise RuntimeError('Cannot modify a type')
+
+    def __reduce__(self):
+        components = tuple(getattr(self, field) for field in self.FIELDS)
+        return _intern, (self.__class__, components)
+
+
+class Unknown(InternedType, BasicMixin):
+    __slots__ = ()
+
     def example(self):
         return object()
 
 
-class NoneType(EqualityMixin, BasicMixin):
+class NoneType(InternedType, BasicMixin):
+    __slots__ = ()
+
     def example(self):
         return None
 
 
-class Bool(EqualityMixin, BasicMixin):
+class Bool(InternedType, BasicMixin):
+    __slots__ = ()
+
     def example(self):
         return True
 
 
-class Num(EqualityMixin, BasicMixin):
+class Num(InternedType, BasicMixin):
+    __slots__ = ()
+
     def example(self):
         return 1
 
 
-class Str(EqualityMixin, BasicMixin):
+class Str(InternedType, BasicMixin):
+    __slots__ = ()
+
     def example(self):
         return 'a'
 
 
-class List(EqualityMixin, ItemTypeMixin):
-    def __init__(self, item_type):
-        self.item_type = item_type
+class List(InternedType, ItemTypeMixin):
+    __slots__ = ('item_type',)
+    FIELDS = __slots__
 
     def example(self):
         return [self.item_type.example()]
 
 
 # hack to allow testing for arbitrary-length tuple
-class BaseTuple(EqualityMixin, BasicMixin):
+class BaseTuple(InternedType, BasicMixin):
+    __slots__ = ()
+
     def example(self):
         return tuple()
 
 
-class Tuple(EqualityMixin, TupleMixin):
-    def __init__(self, item_types):
-        self.item_types = item_types
+class Tuple(InternedType, TupleMixin):
+    __slots__ = ('item_types',)
+    FIELDS = __slots__
+
+    @classmethod
+    def components(cls, item_types):
+        return (tuple(item_types),)
 
     def example(self):
         return tuple(x.example() for x in self.item_types)
 
 
-class Set(EqualityMixin, ItemTypeMixin):
-    def __init__(self, item_type):
-        self.item_type = item_type
+class Set(InternedType, ItemTypeMixin):
+    __slots__ = ('item_type',)
+    FIELDS = __slots__
 
     def example(self):
         return {self.item_type.example()}
 
 
-class Dict(EqualityMixin):
-    def __init__(self, key_type, value_type):
-        self.key_type = key_type
-        self.value_type = value_type
+class Dict(InternedType):
+    __slots__ = ('key_type', 'value_type')
+    FIELDS = __slots__
 
     def example(self):
         return {self.key_type.example(): self.value_type.example()}
@@ -144,10 +246,14 @@ class Class(EqualityMixin, CallableMixin):
         return self.name
 
 
-class Maybe(EqualityMixin):
-    def __init__(self, subtype):
+class Maybe(InternedType):
+    __slots__ = ('subtype',)
+    FIELDS = __slots__
+
+    @classmethod
+    def components(cls, subtype):
         assert subtype is not None
-        self.subtype = subtype
+        return (subtype,)
 
     def example(self):
         return self.subtype.example()
@@ -156,11 +262,15 @@ class Maybe(EqualityMixin):
         return '{0}({1})'.format(self.__class__.__name__, self.subtype)
 
 
-class Union(EqualityMixin):
-    def __init__(self, *subtypes):
+class Union(InternedType):
+    __slots__ = ('subtypes',)
+    FIELDS = __slots__
+
+    @classmethod
+    def components(cls, *subtypes):
         assert len(subtypes) > 0
         assert not any(isinstance(x, list) for x in subtypes)
-        self.subtypes = list(subtypes)
+        return (subtypes,)
 
     def example(self):
         return self.subtypes[0].example()
@@ -1,13 +1,110 @@
 from type_objects import NoneType, Maybe, Unknown, Union, List, Set, \
-    Dict, Tuple, BaseTuple
-from itertools import tee, izip
+    Dict, Tuple, BaseTuple, InternedType
+from itertools import tee, izip, count
+from functools import wraps
+from collections import OrderedDict
+
+
+# maximum number of results remembered for each type operation
+LATTICE_CACHE_SIZE = 4096
 
 
 class UnknownValue(object):
+    """ A value that is not known statically. There is only one, so
+        symbols don't each keep their own. """
+    __slots__ = ()
+
+    def __new__(cls):
+        return _unknown_value
+
+    def __reduce__(self):
+        return UnknownValue, ()
+
     def __str__(self):
         return self.__class__.__name__
 
 
+_unknown_value = object.__new__(UnknownValue)
+
+
+class LatticeCache(object):
+    """ Remembers the results of a type operation. When it holds more than
+        LATTICE_CACHE_SIZE results, the least recently used half of them
+        are forgotten. """
+
+    def __init__(self, function):
+        self.hits = 0
+        self.misses = 0
+        self._function = function
+        self._results = {}      # argument ids -> [result, last use, arguments]
+        self._clock = count()
+
+    def lookup(self, key, arguments):
+        entry = self._results.get(key)
+        if entry is not None:
+            self.hits += 1
+            entry[1] = next(self._clock)
+            return entry[0]
+        self.misses += 1
+        result = self._function(arguments)
+        if len(self._results) >= LATTICE_CACHE_SIZE:
+            self._evict()
+        # the entry keeps the arguments alive so that their ids stay unique
+        self._results[key] = [result, next(self._clock), arguments]
+        return result
+
+    def _evict(self):
+        by_use = sorted(self._results.iteritems(), key=lambda x: x[1][1])
+        for key, _ in by_use[:len(by_use) // 2]:
+            del self._results[key]
+
+    def clear(self):
+        self._results.clear()
+
+
+lattice_caches = OrderedDict()     # operation name -> LatticeCache
+
+
+# types that contain functions, classes or instances can change, so
+# results computed from them are not remembered
+def static_type(type_):
+    return isinstance(type_, InternedType) and type_._static
+
+
+def memoize_types(function):
+    """ For operations on two types. The types are interned, so the results
+        are keyed on their identities. """
+    cache = LatticeCache(lambda types: function(*types))
+    lattice_caches[function.__name__] = cache
+
+    @wraps(function)
+    def wrapper(a, b):
+        if static_type(a) and static_type(b):
+            return cache.lookup((id(a), id(b)), (a, b))
+        return function(a, b)
+    return wrapper
+
+
+def memoize_type_list(function):
+    """ For operations on a sequence of types. Results that are lists are
+        stored as tuples and copied on the way out. """
+    cache = LatticeCache(lambda types: _freeze(function(types)))
+    lattice_caches[function.__name__] = cache
+
+    @wraps(function)
+    def wrapper(types):
+        types = tuple(types)
+        if not all(static_type(x) for x in types):
+            return function(types)
+        result = cache.lookup(tuple(id(x) for x in types), types)
+        return list(result) if isinstance(result, tuple) else result
+    return wrapper
+
+
+def _freeze(result):
+    return tuple(result) if isinstance(result, list) else result
+
+
 def pairwise(iterable):
     a, b = tee(iterable)
     next(b, None)
@@ -23,6 +120,7 @@ def unique_type(types):
     return iter(known).next() if len(known) == 1 else Unknown()
 
 
+@memoize_type_list
 def reduce_types(types):
     new_types = [type_ for type_ in types
                  if not any(type_strict_subset(type_, t) for t in types)]
@@ -42,15 +140,16 @@ def type_union(a, b):
     elif isinstance(a, Union) and isinstance(b, Union):
         return Union(*reduce_types(a.subtypes + b.subtypes))
     elif isinstance(a, Union):
-        return Union(*reduce_types(a.subtypes + [b]))
+        return Union(*reduce_types(a.subtypes + (b,)))
     elif isinstance(b, Union):
-        return Union(*reduce_types(b.subtypes + [a]))
+        return Union(*reduce_types(b.subtypes + (a,)))
     else:
         return Union(*reduce_types([a, b]))
 
 
 # unify_types is the union of all the known types
 # used when types have to be merged such as in if/else expressions
+@memoize_type_list
 def unify_types(types):
     known = known_types(types)
     if len(known) == 0:
@@ -83,6 +182,7 @@ def _comparable_types(a, b):
 
 
 # concept: is it possible for them to have equal value
+@memoize_type_list
 def comparable_types(types):
     known = known_types(types)
     if len(known) < 2:
@@ -100,6 +200,13 @@ def type_subset(a, b):
         return True
     if isinstance(a, Unknown):
         return False
+    if a is b:
+        return True
+    return _structural_subset(a, b)
+
+
+@memoize_types
+def _structural_subset(a, b):
     if isinstance(b, Union):
         if isinstance(a, Union):
             return all(any(type_subset(x, y) for y in b.subtypes)
@@ -147,7 +254,12 @@ def type_intersection(a, b):
         return b
     elif isinstance(b, Unknown):
         return a
-    elif isinstance(a, Maybe) and not isinstance(b, Maybe):
+    return _structural_intersection(a, b)
+
+
+@memoize_types
+def _structural_intersection(a, b):
+    if isinstance(a, Maybe) and not isinstance(b, Maybe):
         return type_intersection(a.subtype, b)
     elif isinstance(b, Maybe) and not isinstance(a, Maybe):
         return type_intersection(a, b.subtype)
@@ -0,0 +1,45 @@
+""" Times visit_expression and static_evaluate on small expressions, to
+    measure how much it costs to dispatch on the kind of node. Run it
+    with "python2.7 bench/dispatch.py". """
+import os
+import sys
+import ast
+import timeit
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from backend import visit_expression, static_evaluate, Context, Symbol, \
+    Num, Str, Unknown
+
+
+EXPRESSIONS = ['x', '(x, s)', '1', 's', 'not x', 'x + 1', '[x, x]',
+               'x == 1', '(x, (x, (x, x)))']
+
+
+def sample_context():
+    context = Context()
+    context.add(Symbol('x', Num(), 1))
+    context.add(Symbol('s', Str(), 'a'))
+    return context
+
+
+def per_node(function, node, repeat):
+    count = sum(1 for child in ast.walk(node) if isinstance(child, ast.expr))
+    best = min(timeit.repeat(function, number=repeat, repeat=3))
+    return best / repeat / count * 1e6
+
+
+def main():
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    context = sample_context()
+    print '{0:20} {1:>12} {2:>12}'.format('expression', 'visit (us)',
+                                          'evaluate (us)')
+    for source in EXPRESSIONS:
+        node = ast.parse(source, mode='eval').body
+        visit = per_node(lambda: visit_expression(node, Unknown(), context),
+                         node, repeat)
+        evaluate = per_node(lambda: static_evaluate(node, context),
+                            node, repeat)
+        print '{0:20} {1:12.2f} {2:12.2f}'.format(source, visit, evaluate)
+
+
+if __name__ == '__main__':
+    main()
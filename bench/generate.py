@@ -0,0 +1,150 @@
+""" Generates Python 2 programs of a given shape and size for the benchmarks
+    in bench/run.py. The output only depends on the shape and the size.
+    Run it with "python2.7 bench/generate.py shape size directory" to write
+    a program to a directory. """
+import os
+import sys
+
+
+def wide(size):
+    """ Many small functions and globals in one module. """
+    lines = []
+    for i in range(size):
+        lines.append('g{0} = {0}'.format(i))
+        lines.append('def f{0}(a, b=1):'.format(i))
+        lines.append('    x = a + b')
+        lines.append('    return x * g{0}'.format(i))
+        lines.append('r{0} = f{0}({0})'.format(i))
+    return {'main.py': lines}
+
+
+def calls(size):
+    """ A chain of functions where each one calls the next. """
+    lines = ['def f{0}(a, s):'.format(size - 1), '    return a * 2']
+    for i in reversed(range(size - 1)):
+        lines.append('def f{0}(a, s):'.format(i))
+        lines.append('    return f{0}(a + 1, s) + len(s)'.format(i + 1))
+    lines.append('r = f0(1, "s")')
+    return {'main.py': lines}
+
+
+def ladder(size):
+    """ A function with a long if/elif ladder. """
+    lines = ['def classify(x, name):', '    y = None']
+    for i in range(size):
+        keyword = 'if' if i == 0 else 'elif'
+        lines.append('    {0} x == {1}:'.format(keyword, i))
+        lines.append('        y = name + "{0}"'.format(i))
+    lines.append('    else:')
+    lines.append('        y = name')
+    lines.append('    return y')
+    lines.append('r = classify(3, "n")')
+    return {'main.py': lines}
+
+
+def literals(size):
+    """ Big list, dict and tuple literals. """
+    lines = ['numbers = [']
+    lines.extend('    {0},'.format(i) for i in range(size))
+    lines.append(']')
+    lines.append('table = {')
+    lines.extend('    "k{0}": {0},'.format(i) for i in range(size))
+    lines.append('}')
+    lines.append('pairs = (')
+    lines.extend('    ({0}, "v{0}"),'.format(i) for i in range(size))
+    lines.append(')')
+    lines.append('first = numbers[0] + table["k0"]')
+    return {'main.py': lines}
+
+
+def binops(size):
+    """ Arithmetic expressions that nest size BinOps deep. """
+    operators = ['+', '*', '-', '+']
+    terms = ['a'] + ['{0} {1}'.format(operators[i % 4], i + 1)
+                     for i in range(size)]
+    lines = ['a = 1', 's = "x"']
+    lines.append('total = ' + ' '.join(terms))
+    lines.append('def f(b):')
+    lines.append('    return ' + ' '.join(['b'] + terms[1:]))
+    lines.append('r = f(a)')
+    lines.append('text = s' + ' + s' * size)
+    return {'main.py': lines}
+
+
+def classes(size):
+    """ Many classes with an __init__ and methods that call each other. """
+    lines = []
+    for i in range(size):
+        lines.append('class C{0}(object):'.format(i))
+        lines.append('    def __init__(self, a):')
+        lines.append('        self.a = a')
+        lines.append('        self.name = "c{0}"'.format(i))
+        lines.append('    def value(self, b):')
+        lines.append('        return self.a + b')
+        lines.append('    def label(self):')
+        lines.append('        return self.name + str(self.value(1))')
+        lines.append('c{0} = C{0}({0})'.format(i))
+        lines.append('v{0} = c{0}.value(2)'.format(i))
+    return {'main.py': lines}
+
+
+def imports(size):
+    """ A chain of modules where each one imports the next, and all of them
+        import a shared module. """
+    files = {'shared.py': ['def base(a):', '    return a + 1']}
+    for i in range(size):
+        lines = ['from shared import base']
+        if i < size - 1:
+            lines.append('import m{0}'.format(i + 1))
+            lines.append('def f(a):')
+            lines.append('    return m{0}.f(base(a))'.format(i + 1))
+        else:
+            lines.append('def f(a):')
+            lines.append('    return base(a)')
+        lines.append('value = f({0})'.format(i))
+        files['m{0}.py'.format(i)] = lines
+    files['main.py'] = ['import m0', 'r = m0.f(1)']
+    return files
+
+
+SHAPES = {
+    'wide': wide,
+    'calls': calls,
+    'ladder': ladder,
+    'literals': literals,
+    'binops': binops,
+    'classes': classes,
+    'imports': imports,
+}
+
+
+def generate(shape, size):
+    """ Maps the file names of the program to their sources. The program
+        starts at main.py. """
+    return {name: '\n'.join(lines) + '\n'
+            for name, lines in SHAPES[shape](size).items()}
+
+
+def write(shape, size, directory):
+    """ Writes the program to the directory and returns the path of its
+        main.py and its number of lines. """
+    files = generate(shape, size)
+    for name, source in files.items():
+        with open(os.path.join(directory, name), 'w') as source_file:
+            source_file.write(source)
+    lines = sum(source.count('\n') for source in files.values())
+    return os.path.join(directory, 'main.py'), lines
+
+
+def main():
+    if len(sys.argv) != 4 or sys.argv[1] not in SHAPES:
+        sys.exit('usage: generate.py {0} size directory'.format(
+            '|'.join(sorted(SHAPES))))
+    directory = sys.argv[3]
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    print write(sys.argv[1], int(sys.argv[2]), directory)[0]
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+""" Times name resolution in contexts with many scope layers and stacked
+    ExtendedContexts, and the analysis of deeply nested closures and
+    branches. Run it with "python2.7 bench/lookup.py". """
+import os
+import sys
+import time
+import timeit
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from backend import Context, ExtendedContext, Symbol, Num
+from main import analysis
+
+
+DEPTHS = [1, 2, 4, 8]
+
+
+def nested_context(depth):
+    """ A global below depth branch scopes, extended depth times. """
+    context = Context()
+    context.begin_scope()
+    context.add(Symbol('g', Num(), 1))
+    for i in range(depth):
+        context.begin_scope()
+        context.add(Symbol('b{0}'.format(i), Num(), i))
+        context = ExtendedContext(context)
+    context.add(Symbol('local', Num(), 2))
+    return context
+
+
+def closures_source(depth):
+    lines = ['g = 1']
+    for i in range(depth):
+        indent = '    ' * i
+        lines.append('{0}def f{1}(a{1}):'.format(indent, i))
+        lines.append('{0}    x{1} = a{1} + g'.format(indent, i))
+    indent = '    ' * depth
+    lines.append('{0}return g + x0 + x{1}'.format(indent, depth - 1))
+    for i in reversed(range(depth - 1)):
+        indent = '    ' * (i + 1)
+        lines.append('{0}return f{1}(x{2})'.format(indent, i + 1, i))
+    lines.append('r = f0(1)')
+    return '\n'.join(lines) + '\n'
+
+
+def branches_source(depth):
+    lines = ['g = 1', 'n = None if g else 1']
+    for i in range(depth):
+        indent = '    ' * i
+        lines.append('{0}if n is not None:'.format(indent))
+        lines.append('{0}    y{1} = n + g'.format(indent, i))
+    return '\n'.join(lines) + '\n'
+
+
+def per_lookup(context, name, repeat):
+    best = min(timeit.repeat(lambda: context.get(name), number=repeat,
+                             repeat=3))
+    return best / repeat * 1e6
+
+
+def per_analysis(source):
+    best = None
+    for _ in range(3):
+        start = time.time()
+        analysis(source, '<bench>')
+        elapsed = time.time() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best * 1e3
+
+
+def main():
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    print '{0:>6} {1:>11} {2:>11} {3:>11} {4:>13} {5:>13}'.format(
+        'depth', 'local (us)', 'global (us)', 'absent (us)',
+        'closures (ms)', 'branches (ms)')
+    for depth in DEPTHS:
+        context = nested_context(depth)
+        print '{0:6} {1:11.2f} {2:11.2f} {3:11.2f} {4:13.1f} {5:13.1f}'.format(
+            depth, per_lookup(context, 'local', repeat),
+            per_lookup(context, 'g', repeat),
+            per_lookup(context, 'absent', repeat),
+            per_analysis(closures_source(depth)),
+            per_analysis(branches_source(depth)))
+
+
+if __name__ == '__main__':
+    main()
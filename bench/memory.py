@@ -0,0 +1,75 @@
+""" Measures the memory that scopes and symbols take after analyzing a
+    generated module with many functions and globals. Run it with
+    "python2.7 bench/memory.py [functions]". """
+import os
+import gc
+import sys
+import resource
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from backend import Scope, UnknownValue
+from main import analysis
+
+
+def module_source(functions):
+    lines = []
+    for i in range(functions):
+        lines.append('g{0} = {0}'.format(i))
+        lines.append('def f{0}(a, b=1, c="c"):'.format(i))
+        lines.append('    x = a + b')
+        lines.append('    y = c * 2')
+        lines.append('    z = [x, b]')
+        lines.append('    return x + g{0}'.format(i))
+        lines.append('r{0} = f{0}({0})'.format(i))
+    return '\n'.join(lines) + '\n'
+
+
+def _size(obj):
+    size = sys.getsizeof(obj)
+    if hasattr(obj, '__dict__'):
+        size += sys.getsizeof(obj.__dict__)
+    return size
+
+
+def footprint(scopes):
+    """ Bytes taken by the scopes, their symbol tables, their symbols and
+        the names and unknown values of the symbols, counting objects
+        that are shared only once. Types and ast nodes are not counted. """
+    seen = set()
+    total = 0
+    symbols = 0
+    for scope in scopes:
+        for obj in (scope, scope._symbols):
+            if id(obj) not in seen:
+                seen.add(id(obj))
+                total += _size(obj)
+        for symbol in scope._symbols.values() + [scope._return]:
+            if symbol is None or id(symbol) in seen:
+                continue
+            symbols += 1
+            seen.add(id(symbol))
+            total += _size(symbol)
+            for part in (symbol.get_name(), symbol.get_value()):
+                if (isinstance(part, (str, UnknownValue))
+                        and id(part) not in seen):
+                    seen.add(id(part))
+                    total += _size(part)
+    return total, symbols
+
+
+def main():
+    functions = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    source = module_source(functions)
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    analysis(source, '<bench>')
+    after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    gc.collect()
+    scopes = [obj for obj in gc.get_objects() if isinstance(obj, Scope)]
+    total, symbols = footprint(scopes)
+    print '{0} scopes, {1} symbols'.format(len(scopes), symbols)
+    print '{0:.1f} bytes per symbol, including its share of the scopes'.format(
+        float(total) / max(symbols, 1))
+    print '{0} KB peak RSS growth'.format(after - before)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,169 @@
+""" Analyzes the programs of bench/generate.py at increasing sizes and
+    reports lines per second, peak RSS and how the time grows with the
+    size. Run it with "python2.7 bench/run.py", pass --save to keep the
+    results as a baseline and --baseline to compare against one, which
+    fails if a shape got much slower or its time grows faster with the
+    size than it did. Each measurement is taken in a new process, so that
+    caches and memory don't carry over between sizes. """
+import os
+import sys
+import json
+import math
+import shutil
+import optparse
+import resource
+import tempfile
+import subprocess
+from timeit import default_timer
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from cache import ModuleCache
+from main import ModuleTable, check_files, get_builtin_scopes
+from generate import SHAPES, write
+
+
+# sizes of each shape, so that the largest takes a few seconds at most
+SIZES = {
+    'wide': [50, 100, 200, 400],
+    'calls': [8, 16, 32, 64],
+    'ladder': [100, 200, 400, 800],
+    'literals': [500, 1000, 2000, 4000],
+    'binops': [100, 200, 400, 800],
+    'classes': [25, 50, 100, 200],
+    'imports': [25, 50, 100, 200],
+}
+
+
+def measure(shape, size):
+    """ Runs in the measuring process. Builtins are analyzed before the
+        clock starts. """
+    directory = tempfile.mkdtemp(prefix='pystarch-bench-')
+    try:
+        path, lines = write(shape, size, directory)
+        get_builtin_scopes()
+        start = default_timer()
+        check_files([path], ModuleTable(ModuleCache()))
+        seconds = default_timer() - start
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return {'lines': lines, 'seconds': seconds, 'rss_kb': rss}
+
+
+def run_measure(shape, size, repeat):
+    """ The fastest of repeat runs, and the largest peak RSS. """
+    results = []
+    for _ in range(repeat):
+        output = subprocess.check_output([
+            sys.executable, os.path.abspath(__file__), '--measure', shape,
+            str(size)])
+        results.append(json.loads(output))
+    return {'lines': results[0]['lines'],
+            'seconds': min(result['seconds'] for result in results),
+            'rss_kb': max(result['rss_kb'] for result in results)}
+
+
+def exponent(smaller, larger, size_ratio):
+    """ How the time grows with the size, 1 for linear and 2 for quadratic.
+        None if a time is too short to tell. """
+    if min(smaller['seconds'], larger['seconds']) < 1e-3:
+        return None
+    return math.log(larger['seconds'] / smaller['seconds']) / math.log(
+        size_ratio)
+
+
+def curve(shape, sizes, repeat):
+    """ Maps each size to its measurement, with the exponent of the step
+        from the size before it. """
+    results = {}
+    previous = None
+    for size in sizes:
+        result = run_measure(shape, size, repeat)
+        result['exponent'] = (None if previous is None else exponent(
+            results[previous], result, float(size) / previous))
+        results[size] = result
+        previous = size
+        print_row(shape, size, result)
+    return results
+
+
+def print_row(shape, size, result):
+    rate = result['lines'] / max(result['seconds'], 1e-9)
+    growth = ('{0:8.2f}'.format(result['exponent'])
+              if result['exponent'] is not None else '{0:>8}'.format('-'))
+    print '{0:<9} {1:>6} {2:>7} {3:9.3f} {4:10.0f} {5:9.1f} {6}'.format(
+        shape, size, result['lines'], result['seconds'], rate,
+        result['rss_kb'] / 1024.0, growth)
+    sys.stdout.flush()
+
+
+def compare(results, baseline, slowdown, growth):
+    """ The regressions of the results against the baseline: a size that
+        takes more than slowdown times as long, or a step whose exponent
+        is more than growth above the baseline's. """
+    regressions = []
+    for shape, sizes in sorted(results.items()):
+        for size, result in sorted(sizes.items()):
+            before = baseline.get(shape, {}).get(str(size))
+            if before is None:
+                continue
+            if result['seconds'] > before['seconds'] * slowdown:
+                regressions.append('{0} {1}: {2:.3f}s, was {3:.3f}s'.format(
+                    shape, size, result['seconds'], before['seconds']))
+            if (result['exponent'] is not None
+                    and before['exponent'] is not None
+                    and result['exponent'] > before['exponent'] + growth):
+                regressions.append(
+                    '{0} {1}: grows as size^{2:.2f}, was size^{3:.2f}'.format(
+                        shape, size, result['exponent'], before['exponent']))
+    return regressions
+
+
+def main():
+    parser = optparse.OptionParser(usage='%prog [options] [shape]...')
+    parser.add_option('--repeat', dest='repeat', default=3, type='int',
+                      help='Runs of each size, the fastest is kept')
+    parser.add_option('--save', dest='save',
+                      help='Write the results to this file')
+    parser.add_option('--baseline', dest='baseline',
+                      help='Compare the results with this file')
+    parser.add_option('--slowdown', dest='slowdown', default=1.5,
+                      type='float',
+                      help='Time ratio to the baseline that is a regression')
+    parser.add_option('--growth', dest='growth', default=0.3, type='float',
+                      help='Increase of the exponent that is a regression')
+    parser.add_option('--measure', dest='measure', default=False,
+                      action='store_true', help=optparse.SUPPRESS_HELP)
+    options, args = parser.parse_args()
+    if options.measure:
+        print json.dumps(measure(args[0], int(args[1])))
+        return
+    shapes = args or sorted(SIZES)
+    for shape in shapes:
+        if shape not in SHAPES:
+            parser.error('unknown shape: ' + shape)
+
+    print '{0:<9} {1:>6} {2:>7} {3:>9} {4:>10} {5:>9} {6:>8}'.format(
+        'shape', 'size', 'lines', 'seconds', 'lines/sec', 'rss (MB)',
+        'exponent')
+    results = {}
+    for shape in shapes:
+        results[shape] = curve(shape, SIZES[shape], options.repeat)
+    if options.save:
+        with open(options.save, 'w') as save_file:
+            json.dump({shape: {str(size): result
+                               for size, result in sizes.items()}
+                       for shape, sizes in results.items()},
+                      save_file, indent=1, sort_keys=True)
+    if options.baseline:
+        with open(options.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+        regressions = compare(results, baseline, options.slowdown,
+                              options.growth)
+        for regression in regressions:
+            print 'REGRESSION ' + regression
+        if len(regressions) > 0:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
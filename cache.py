@@ -0,0 +1,216 @@
+import os
+import cPickle as pickle
+from cStringIO import StringIO
+from hashlib import sha256
+
+
+# change whenever the pickled form of a summary changes
+SUMMARY_FORMAT = 7
+
+INTERFACE_EXTENSION = '.pysi'
+
+
+def file_digest(filepath):
+    with open(filepath, 'rb') as source_file:
+        return sha256(source_file.read()).hexdigest()
+
+
+def dependencies_valid(dependencies):
+    """ Whether every source file still has the digest it had. """
+    for filepath, digest in dependencies.iteritems():
+        try:
+            if file_digest(filepath) != digest:
+                return False
+        except (IOError, OSError):
+            return False
+    return True
+
+
+def dump_summary(module, builtin_scopes, references):
+    """ Pickles a module Instance. Builtin scopes and the Instances and
+        Scopes of other modules, whose ids references maps to
+        "module:<filepath>" or "scope:<filepath>", are pickled by
+        reference. Returns None if the module can't be pickled. """
+    builtin_ids = {id(scope): i for i, scope in enumerate(builtin_scopes)}
+
+    def persistent_id(obj):
+        if id(obj) in builtin_ids:
+            return 'builtin:{0}'.format(builtin_ids[id(obj)])
+        if obj is not module and obj is not module.attributes:
+            return references.get(id(obj))
+        return None
+
+    buf = StringIO()
+    pickler = pickle.Pickler(buf, pickle.HIGHEST_PROTOCOL)
+    pickler.persistent_id = persistent_id
+    try:
+        pickler.dump(module)
+    except (pickle.PicklingError, TypeError, RuntimeError):
+        return None     # unpicklable or too deeply nested
+    return buf.getvalue()
+
+
+def load_summary(summary, builtin_scopes, resolve):
+    """ resolve(filepath) must return the module Instance for an imported
+        module referenced by the summary. """
+    def persistent_load(pid):
+        kind, _, name = pid.partition(':')
+        if kind == 'builtin':
+            return builtin_scopes[int(name)]
+        elif kind == 'scope':
+            return resolve(name).attributes
+        return resolve(name)
+
+    unpickler = pickle.Unpickler(StringIO(summary))
+    unpickler.persistent_load = persistent_load
+    return unpickler.load()
+
+
+def interface_path(filepath):
+    return os.path.splitext(filepath)[0] + INTERFACE_EXTENSION
+
+
+def write_interface(filepath, digest, salt, module, dependencies,
+                    builtin_scopes, references):
+    """ Writes the interface of a module next to its source. dependencies
+        maps the source files that the interface was computed from to
+        their digests. Returns whether it was written. """
+    summary = dump_summary(module, builtin_scopes, references)
+    if summary is None:
+        return False
+    entry = {'format': SUMMARY_FORMAT, 'salt': salt, 'digest': digest,
+             'dependencies': dependencies, 'summary': summary}
+    path = interface_path(filepath)
+    temp_path = '{0}.{1}'.format(path, os.getpid())
+    try:
+        with open(temp_path, 'wb') as interface_file:
+            pickle.dump(entry, interface_file, pickle.HIGHEST_PROTOCOL)
+        os.rename(temp_path, path)
+    except (IOError, OSError):
+        return False
+    return True
+
+
+def read_interface(filepath, digest, salt, builtin_scopes, resolve):
+    """ Returns the module Instance of the interface next to a module and
+        its dependencies, or None if there is none or it was written for
+        another version of the module, of a module it depends on or of
+        builtins.py. """
+    path = interface_path(filepath)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'rb') as interface_file:
+            entry = pickle.load(interface_file)
+    except Exception:   # pylint: disable=broad-except
+        return None
+    if (entry.get('format') != SUMMARY_FORMAT or entry.get('salt') != salt
+            or entry.get('digest') != digest
+            or not dependencies_valid(entry['dependencies'])):
+        return None
+    module = load_summary(entry['summary'], builtin_scopes, resolve)
+    return module, entry['dependencies']
+
+
+class ModuleCache(object):
+    """ Stores the summary of each analyzed module on disk, keyed by the
+        module source. An entry also records the digests of every module
+        that was imported (transitively) while analyzing it, and it is only
+        used if none of those files have changed since.
+
+        A summary is the pickled module Instance. Builtin scopes and the
+        Instances and Scopes of other modules are pickled by reference, so
+        that loading an entry reuses the builtin context and the modules it
+        imports. """
+
+    def __init__(self, directory=None, salt=''):
+        self._directory = directory
+        self._salt = salt
+        self._frames = []       # modules that are currently being analyzed
+
+    def enabled(self):
+        return self._directory is not None
+
+    def _entry_path(self, filepath, digest):
+        key = sha256('{0}~{1}~{2}~{3}'.format(
+            SUMMARY_FORMAT, self._salt, filepath, digest)).hexdigest()
+        return os.path.join(self._directory, key)
+
+    def depend(self, dependencies, complete=True):
+        """ Record that the module being analyzed imports a module with
+            the given transitive dependencies. """
+        if len(self._frames) > 0:
+            self._frames[-1]['dependencies'].update(dependencies)
+        if not complete:
+            self.incomplete()
+
+    def incomplete(self):
+        # a module saw a placeholder for another module, so neither it
+        # nor anything that imports it has a summary worth storing
+        for frame in self._frames:
+            frame['complete'] = False
+
+    def discard(self):
+        """ Ends the innermost frame without storing a summary. Returns its
+            dependencies and whether it is complete. """
+        frame = self._frames.pop()
+        self.depend(frame['dependencies'], frame['complete'])
+        return frame['dependencies'], frame['complete']
+
+    def begin(self, source_path, digest):
+        self._frames.append({'dependencies': {source_path: digest},
+                             'digest': digest, 'complete': True})
+
+    def end(self, filepath, module, builtin_scopes, references):
+        """ Pass module=None if the analysis failed. references maps the ids
+            of other modules' Instances and Scopes to the strings that
+            resolve them, "module:<filepath>" or "scope:<filepath>".
+            Returns the transitive dependencies of the module and whether
+            it is complete. """
+        frame = self._frames.pop()
+        dependencies, complete = frame['dependencies'], frame['complete']
+        if module is None:
+            complete = False
+        elif complete and self.enabled():
+            self._store(filepath, frame['digest'], module, dependencies,
+                        builtin_scopes, references)
+        self.depend(dependencies, complete)
+        return dependencies, complete
+
+    def _store(self, filepath, digest, module, dependencies, builtin_scopes,
+               references):
+        summary = dump_summary(module, builtin_scopes, references)
+        if summary is None:
+            return
+        entry = {'dependencies': dependencies, 'summary': summary}
+        entry_path = self._entry_path(filepath, digest)
+        temp_path = '{0}.{1}'.format(entry_path, os.getpid())
+        try:
+            if not os.path.isdir(self._directory):
+                os.makedirs(self._directory)
+            with open(temp_path, 'wb') as entry_file:
+                pickle.dump(entry, entry_file, pickle.HIGHEST_PROTOCOL)
+            os.rename(temp_path, entry_path)    # atomic for other processes
+        except (IOError, OSError):
+            pass
+
+    def load(self, filepath, digest, builtin_scopes, resolve):
+        """ Returns the cached module Instance and its dependencies, or None
+            on a cache miss. resolve(filepath) must return the module
+            Instance for an imported module referenced by the summary. """
+        if not self.enabled():
+            return None
+        entry_path = self._entry_path(filepath, digest)
+        if not os.path.exists(entry_path):
+            return None
+        try:
+            with open(entry_path, 'rb') as entry_file:
+                entry = pickle.load(entry_file)
+        except Exception:   # pylint: disable=broad-except
+            return None     # corrupt or written by an incompatible version
+        dependencies = entry['dependencies']
+        if not dependencies_valid(dependencies):
+            return None
+        module = load_summary(entry['summary'], builtin_scopes, resolve)
+        self.depend(dependencies)
+        return module, dependencies
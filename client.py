@@ -0,0 +1,79 @@
+""" Checks files with a running daemon.py. Takes the same files and
+    -t, -0 and -f options as main.py, but only imports the standard library
+    so that it starts quickly. """
+import os
+import sys
+import json
+import socket
+import optparse
+
+
+def default_socket_path():
+    return os.path.join(os.path.expanduser('~'), '.pystarch', 'daemon.sock')
+
+
+def receive_all(connection):
+    chunks = []
+    while True:
+        chunk = connection.recv(65536)
+        if not chunk:
+            return ''.join(chunks)
+        chunks.append(chunk)
+
+
+def send_request(socket_path, request):
+    connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        connection.connect(socket_path)
+        connection.sendall(json.dumps(request))
+        connection.shutdown(socket.SHUT_WR)
+        return json.loads(receive_all(connection))
+    finally:
+        connection.close()
+
+
+def main():
+    parser = optparse.OptionParser(
+        usage='%prog [options] [file | directory | glob]...')
+    parser.add_option('-t', '--types', dest='show_types', default=False,
+                      action='store_true',
+                      help='Show types of symbols defined in top scope')
+    parser.add_option('-0', '--null', dest='null', default=False,
+                      action='store_true',
+                      help='Read a NUL-separated list of files from stdin')
+    parser.add_option('-f', '--format', dest='output_format', default='text',
+                      type='choice', choices=['jsonl', 'sarif', 'text'],
+                      help='Format of the warnings: jsonl, sarif, text '
+                      '(default: text)')
+    parser.add_option('--socket', dest='socket_path',
+                      default=default_socket_path(),
+                      help='Socket of the daemon')
+    parser.add_option('--stop', dest='stop', default=False,
+                      action='store_true', help='Stop the daemon')
+    options, args = parser.parse_args()
+    if options.show_types and options.output_format != 'text':
+        parser.error('-t is only supported with the text format')
+    if options.null:
+        args += [path for path in sys.stdin.read().split('\0') if path]
+    if options.stop:
+        request = {'command': 'stop'}
+    elif len(args) == 0:
+        parser.error('no files to check')
+    else:
+        request = {'command': 'check', 'cwd': os.getcwd(), 'args': args,
+                   'show_types': options.show_types,
+                   'format': options.output_format}
+    try:
+        response = send_request(options.socket_path, request)
+    except socket.error as error:
+        sys.stderr.write('Could not reach daemon at {0}: {1}\n'.format(
+            options.socket_path, error))
+        sys.exit(2)
+    if 'error' in response:
+        sys.stderr.write(response['error'])
+        sys.exit(1)
+    sys.stdout.write(response.get('output', ''))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,202 @@
+""" A resident process that keeps analyzed modules in memory between
+    checks. Start it with "python2.7 daemon.py [directory]" and check files
+    with client.py. Source files are watched with inotify if pyinotify is
+    installed, otherwise they are polled, and only the modules that depend
+    on changed files are analyzed again. """
+import os
+import sys
+import json
+import errno
+import select
+import socket
+import optparse
+import traceback
+from cStringIO import StringIO
+from cache import file_digest
+from client import default_socket_path, receive_all
+from main import (ModuleTable, module_cache, find_source_files, check_files,
+                  check_file, get_builtin_scopes, make_writer)
+
+try:
+    import pyinotify
+except ImportError:
+    pyinotify = None
+
+
+class PollWatcher(object):
+    """ Finds changed source files by comparing the modification times of
+        the files that the analyzed modules depend on, and then their
+        digests. """
+
+    def __init__(self, modules):
+        self._modules = modules
+        self._mtimes = {}       # source path -> mtime when last compared
+
+    def fileno(self):
+        return None
+
+    def changes(self):
+        changed = set()
+        for source_path, digest in self._modules.sources().iteritems():
+            try:
+                mtime = os.stat(source_path).st_mtime
+            except OSError:
+                changed.add(source_path)
+                continue
+            if self._mtimes.get(source_path) == mtime:
+                continue
+            self._mtimes[source_path] = mtime
+            try:
+                if file_digest(source_path) != digest:
+                    changed.add(source_path)
+            except (IOError, OSError):
+                changed.add(source_path)
+        return changed
+
+
+class InotifyWatcher(object):
+    """ Collects the Python files that change under a directory. """
+
+    MASK = (pyinotify.IN_CLOSE_WRITE | pyinotify.IN_MOVED_TO |
+            pyinotify.IN_MOVED_FROM | pyinotify.IN_CREATE |
+            pyinotify.IN_DELETE) if pyinotify else 0
+
+    def __init__(self, directory):
+        self._changed = set()
+        self._manager = pyinotify.WatchManager()
+        self._notifier = pyinotify.Notifier(self._manager, self._collect,
+                                            timeout=0)
+        self._manager.add_watch(os.path.abspath(directory), self.MASK,
+                                rec=True, auto_add=True)
+
+    def _collect(self, event):
+        if event.pathname.endswith('.py'):
+            self._changed.add(event.pathname)
+
+    def fileno(self):
+        return self._manager.get_fd()
+
+    def changes(self):
+        while self._notifier.check_events(timeout=0):
+            self._notifier.read_events()
+            self._notifier.process_events()
+        changed, self._changed = self._changed, set()
+        return changed
+
+
+class Daemon(object):
+
+    def __init__(self, watch_directory, interval=1.0):
+        self._modules = ModuleTable(module_cache)
+        self._checked = set()   # (working directory, path) of checked files
+        self._interval = interval
+        if pyinotify is None or watch_directory is None:
+            self._watcher = PollWatcher(self._modules)
+        else:
+            self._watcher = InotifyWatcher(watch_directory)
+
+    def refresh(self):
+        """ Forget modules that depend on changed files, and check the
+            files that were checked before again so that the next request
+            for them is answered from memory. """
+        changed = self._watcher.changes()
+        if len(changed) == 0:
+            return
+        stale = self._modules.invalidate(changed)
+        for directory, filepath in sorted(self._checked):
+            if os.path.abspath(os.path.join(directory, filepath)) in stale:
+                try:
+                    os.chdir(directory)
+                    self._modules.check(filepath)
+                except Exception:   # pylint: disable=broad-except
+                    self._checked.discard((directory, filepath))
+
+    def check(self, directory, args, show_types, output_format='text'):
+        os.chdir(directory)
+        filepaths = find_source_files(args)
+        if output_format == 'text':
+            output = check_files(filepaths, self._modules, show_types)
+        else:
+            output = self._write(filepaths, output_format)
+        self._checked.update((directory, filepath) for filepath in filepaths)
+        return output
+
+    def _write(self, filepaths, output_format):
+        """ The warnings in another format. They are kept, unlike those
+            written by main.py, to answer the next request from memory. """
+        stream = StringIO()
+        writer = make_writer(output_format, stream)
+        writer.begin()
+        try:
+            for filepath in sorted(filepaths):
+                warnings = check_file(filepath, self._modules)[1]
+                for record in warnings.records():
+                    writer.write(record)
+        finally:
+            writer.end()
+        return stream.getvalue()
+
+    def handle(self, connection):
+        """ Returns False when the daemon should stop. """
+        request = json.loads(receive_all(connection))
+        if request['command'] == 'stop':
+            connection.sendall(json.dumps({}))
+            return False
+        self.refresh()
+        try:
+            response = {'output': self.check(
+                request['cwd'], request['args'], request['show_types'],
+                request.get('format', 'text'))}
+        except Exception:   # pylint: disable=broad-except
+            response = {'error': traceback.format_exc()}
+        connection.sendall(json.dumps(response))
+        return True
+
+    def serve(self, socket_path):
+        get_builtin_scopes()
+        listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            os.unlink(socket_path)
+        except OSError as error:
+            if error.errno != errno.ENOENT:
+                raise
+        listener.bind(socket_path)
+        listener.listen(8)
+        readers = [listener] + ([self._watcher]
+                                if self._watcher.fileno() is not None else [])
+        try:
+            running = True
+            while running:
+                ready, _, _ = select.select(readers, [], [], self._interval)
+                if listener not in ready:
+                    self.refresh()
+                    continue
+                connection, _ = listener.accept()
+                try:
+                    running = self.handle(connection)
+                finally:
+                    connection.close()
+        finally:
+            listener.close()
+            os.unlink(socket_path)
+
+
+def main():
+    parser = optparse.OptionParser(usage='%prog [options] [directory]')
+    parser.add_option('--socket', dest='socket_path',
+                      default=default_socket_path(),
+                      help='Socket to listen on')
+    parser.add_option('--interval', dest='interval', default=1.0,
+                      type='float',
+                      help='Seconds between checks for changed files')
+    options, args = parser.parse_args()
+    directory = args[0] if len(args) > 0 else None
+    socket_dir = os.path.dirname(options.socket_path)
+    if socket_dir and not os.path.isdir(socket_dir):
+        os.makedirs(socket_dir)
+    sys.stderr.write('Listening on {0}\n'.format(options.socket_path))
+    Daemon(directory, options.interval).serve(options.socket_path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+def strongly_connected_components(graph):
+    """ Tarjan's algorithm. graph maps each node to the nodes it depends
+        on. Components are returned dependencies first. """
+    index = {}
+    lowlink = {}
+    stack = []
+    on_stack = set()
+    components = []
+    for root in sorted(graph):
+        if root in index:
+            continue
+        # iterative so that long import chains don't hit the recursion limit
+        work = [(root, iter(sorted(graph[root])))]
+        index[root] = lowlink[root] = len(index)
+        stack.append(root)
+        on_stack.add(root)
+        while len(work) > 0:
+            node, successors = work[-1]
+            pushed = False
+            for successor in successors:
+                if successor not in index:
+                    index[successor] = lowlink[successor] = len(index)
+                    stack.append(successor)
+                    on_stack.add(successor)
+                    work.append((successor,
+                                 iter(sorted(graph.get(successor, ())))))
+                    pushed = True
+                    break
+                elif successor in on_stack:
+                    lowlink[node] = min(lowlink[node], index[successor])
+            if pushed:
+                continue
+            work.pop()
+            if len(work) > 0:
+                parent = work[-1][0]
+                lowlink[parent] = min(lowlink[parent], lowlink[node])
+            if lowlink[node] == index[node]:
+                component = []
+                while True:
+                    member = stack.pop()
+                    on_stack.remove(member)
+                    component.append(member)
+                    if member == node:
+                        break
+                components.append(sorted(component))
+    return components
+
+
+def cyclic_nodes(graph):
+    """ The nodes that are part of a dependency cycle. """
+    cyclic = set()
+    for component in strongly_connected_components(graph):
+        if len(component) > 1 or component[0] in graph.get(component[0], ()):
+            cyclic.update(component)
+    return cyclic
+
+
+def dependents(graph, nodes):
+    """ The given nodes and every node that depends on them,
+        directly or indirectly. """
+    reverse = {}
+    for node, successors in graph.iteritems():
+        for successor in successors:
+            reverse.setdefault(successor, set()).add(node)
+    closure = set(nodes)
+    pending = list(nodes)
+    while len(pending) > 0:
+        for node in reverse.get(pending.pop(), ()):
+            if node not in closure:
+                closure.add(node)
+                pending.append(node)
+    return closure
@@ -0,0 +1,41 @@
+""" Writes an interface file next to each module of a package tree, with
+    the signatures and return types of its functions, the methods and
+    instance attributes of its classes and its constants. Modules that
+    import one of them read the interface instead of analyzing the module,
+    for as long as the module and builtins.py don't change. Run it with
+    "python2.7 interfaces.py [file | directory | glob]...". """
+import sys
+import optparse
+import traceback
+from cache import interface_path
+from main import ModuleTable, module_cache, find_source_files
+
+
+def main():
+    parser = optparse.OptionParser(
+        usage='%prog [options] [file | directory | glob]...')
+    parser.add_option('--no-cache', dest='use_cache', default=True,
+                      action='store_false',
+                      help='Do not use cached summaries of imported modules')
+    options, args = parser.parse_args()
+    if len(args) == 0:
+        parser.error('no files to write interfaces for')
+    modules = ModuleTable(module_cache if options.use_cache else None)
+    failed = 0
+    for filepath in find_source_files(args):
+        try:
+            written = modules.write_interface(filepath)
+        except Exception:   # pylint: disable=broad-except
+            sys.stderr.write('{0}: {1}'.format(filepath,
+                                               traceback.format_exc()))
+            written = False
+        if written:
+            print interface_path(filepath)
+        else:
+            failed += 1
+            sys.stderr.write('{0}: no interface written\n'.format(filepath))
+    sys.exit(1 if failed > 0 else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -2,18 +2,30 @@ import os
 import sys
 import ast
 import imp
+import glob
 import marshal
 import meta
-import cPickle as pickle
+import shutil
 import optparse
-from hashlib import sha256
+import tempfile
+import traceback
+import multiprocessing
+from Queue import Queue
+from cache import ModuleCache, file_digest, read_interface, write_interface
 from visitor import ScopeVisitor
-from backend import Scope, Symbol, Instance, Context, Unknown
+from warning import Warnings, WRITERS
+from graph import cyclic_nodes, dependents
+from backend import Scope, Symbol, Instance, Context, Unknown, \
+    evaluator_stats, lattice_caches, node_results, fold_stats, profiler, \
+    stub_module, ChainedScope, lookup_stats
 
 
 NAME = 'strictpy'
 __version__ = '1.0.0'
 
+# visiting an expression takes a few frames for each level of nesting
+sys.setrecursionlimit(max(sys.getrecursionlimit(), 10000))
+
 
 def pyc_source(pyc_contents):
     code_section = pyc_contents[8:]
@@ -54,72 +66,335 @@ def get_module_source_path(import_name, current_filepath):
     return module_path, False
 
 
-def import_source(import_name, current_filepath):
-    module_path, is_package = get_module_source_path(
-        import_name, current_filepath)
+def get_source_file(module_path):
     if module_path.endswith('.py'):
-        with open(module_path) as module_file:
-            return module_file.read(), module_path, is_package
+        return module_path
     elif module_path.endswith(('.pyc', '.pyo')):
         py_path = module_path[:-1]  # look for ".py" file in same dir
-        if os.path.exists(py_path):
-            with open(py_path) as py_file:
-                return py_file.read(), module_path, is_package
-        else:
-            with open(module_path) as module_file:
-                return pyc_source(module_file.read()), module_path, is_package
+        return py_path if os.path.exists(py_path) else module_path
     else:
         raise RuntimeError('Unrecognized extension: ' + module_path)
 
 
-def import_module(name, current_filepath, imported, warn):
+def read_source(source_path):
+    with open(source_path) as source_file:
+        contents = source_file.read()
+    if source_path.endswith(('.pyc', '.pyo')):
+        return pyc_source(contents)
+    return contents
+
+
+class LazyModule(Instance):
+    """ A module Instance that is only analyzed when its attributes are
+        first used. Each use resolves it through the module table, so that
+        the module being analyzed at the time depends on it. """
+    __slots__ = ('_filepath', '_modules')
+
+    def __init__(self, filepath, modules):
+        # pylint: disable=super-init-not-called
+        self.class_name = 'object'
+        self.initialized = False
+        self._filepath = filepath
+        self._modules = modules
+
+    @property
+    def attributes(self):
+        return self._modules.resolve(self._filepath).attributes
+
+    def __eq__(self, other):
+        if isinstance(other, LazyModule):
+            return self._filepath == other._filepath
+        return (isinstance(other, Instance)
+                and self._modules.resolve(self._filepath) == other)
+
+    def __str__(self):
+        return 'Instance({0})'.format(self.class_name)
+
+
+class ModuleTable(object):
+    """ The modules imported or checked during one run, keyed by resolved
+        file path, so that each module is analyzed at most once per run. """
+
+    def __init__(self, cache=None):
+        self.cache = cache if cache is not None else ModuleCache()
+        self._modules = {}          # filepath -> module Instance
+        self._references = {}       # id(Instance or Scope) -> reference
+        self._dependencies = {}     # filepath -> (dependencies, complete)
+        self._warnings = {}         # filepath -> Warnings
+        self._views = {}            # id(view) -> (view, module Instance)
+        self._proxies = {}          # filepath -> LazyModule
+        self._imported = {}         # filepath -> {source path: digest}
+        self._in_progress = set()
+        self._locations = {}        # (import name, directory) -> location
+        self.analyzed = 0
+        self.loaded = 0
+        self.saved = 0
+        self.interfaces = 0
+        self.failed = 0
+
+    def locate(self, import_name, current_filepath):
+        directory = (current_filepath if import_name is None else
+                     os.path.dirname(os.path.abspath(current_filepath)))
+        key = (import_name, directory)
+        if key not in self._locations:
+            try:
+                filepath, is_package = get_module_source_path(
+                    import_name, current_filepath)
+                get_source_file(filepath)
+                self._locations[key] = (filepath, is_package)
+            except RuntimeError as error:
+                self._locations[key] = error
+        location = self._locations[key]
+        if isinstance(location, RuntimeError):
+            raise location
+        return location
+
+    def _add(self, filepath, module, dependencies, complete):
+        self._modules[filepath] = module
+        self._references[id(module)] = 'module:' + filepath
+        self._references[id(module.attributes)] = 'scope:' + filepath
+        self._dependencies[filepath] = (dependencies, complete)
+
+    def bind(self, scope, name, module, submodules):
+        """ Add an imported module to the scope of the importer. Submodules
+            ("import a.b") are added to the importer's own view of the
+            module, so that imported modules are never modified by the
+            modules that import them. The view only analyzes the module
+            when a name that the importer didn't add is used. """
+        # the view's own submodules, without analyzing the module it views
+        symbol = (scope.get_local(name) if isinstance(scope, ChainedScope)
+                  else scope.get(name))
+        bound = symbol.get_type() if symbol is not None else None
+        if id(bound) in self._views and self._views[id(bound)][1] is module:
+            return bound
+        if submodules and isinstance(module, Instance):
+            view = Instance(module.class_name, ChainedScope(module))
+            self._views[id(view)] = (view, module)
+            module = view
+        scope.add(Symbol(name, module))
+        return module
+
+    def load(self, filepath):
+        """ The module Instance of an imported file. Unless the module is
+            already loaded, it is a LazyModule, which is analyzed when its
+            attributes are first used. The importer only depends on the
+            source of the module until then. """
+        if filepath in self._modules and filepath not in self._proxies:
+            self.saved += 1
+            self.cache.depend(*self._dependencies[filepath])
+            if profiler.enabled:
+                profiler.reuse('module', filepath)
+            return self._modules[filepath]
+        if filepath not in self._proxies:
+            self._proxies[filepath] = LazyModule(filepath, self)
+            self._references[id(self._proxies[filepath])] = (
+                'module:' + filepath)
+        if filepath not in self._imported:
+            source_path = get_source_file(filepath)
+            self._imported[filepath] = {source_path: file_digest(source_path)}
+        self.cache.depend(self._imported[filepath])
+        return self._proxies[filepath]
+
+    def resolve(self, filepath):
+        """ The analyzed module of a LazyModule. """
+        if filepath in self._in_progress:
+            self.cache.incomplete()
+            return Instance('object', Scope())
+        if filepath in self._modules:
+            self.cache.depend(*self._dependencies[filepath])
+            return self._modules[filepath]
+
+        source_path = get_source_file(filepath)
+        digest = file_digest(source_path)
+        # an interface is preferred, since it is written on purpose
+        interface = read_interface(filepath, digest, cache_salt(),
+                                   get_builtin_scopes(), self.load)
+        if interface is not None:
+            module, dependencies = interface
+            self.interfaces += 1
+            if profiler.enabled:
+                profiler.reuse('module', filepath)
+            self.cache.depend(dependencies)
+            self._add(filepath, module, dependencies, True)
+            return module
+
+        cached = self.cache.load(filepath, digest, get_builtin_scopes(),
+                                  self.load)
+        if cached is not None:
+            module, dependencies = cached
+            self.loaded += 1
+            if profiler.enabled:
+                profiler.reuse('module', filepath)
+            self._add(filepath, module, dependencies, True)
+            return module
+
+        module, _, _ = self._analyze(filepath, source_path, digest, filepath)
+        return module
+
+    def write_interface(self, filepath):
+        """ Analyze a file and write its interface next to it. Returns
+            whether it was written, which it isn't if the analysis saw an
+            import cycle. """
+        path = os.path.abspath(filepath)
+        source_path = get_source_file(path)
+        digest = file_digest(source_path)
+        module, _, complete = self._analyze(path, source_path, digest,
+                                            filepath)
+        if not complete:
+            return False
+        # the module's own scope is stubbed, and the other modules and
+        # builtins are kept as references
+        keep = (set(self._references) - set([id(module),
+                                             id(module.attributes)])) | set(
+            id(scope) for scope in get_builtin_scopes())
+        # the modules that stubbing uses, such as those that __init__ of a
+        # class uses, are dependencies of the interface too
+        dependencies = dict(self._dependencies[path][0])
+        self.cache.begin(source_path, digest)
+        try:
+            interface = stub_module(module, keep)
+        finally:
+            stub_dependencies, complete = self.cache.discard()
+        if not complete:
+            return False
+        dependencies.update(stub_dependencies)
+        return write_interface(path, digest, cache_salt(), interface,
+                               dependencies, get_builtin_scopes(),
+                               self._references)
+
+    def _analyze(self, filepath, source_path, digest, label, writer=None):
+        module = None
+        self._in_progress.add(filepath)
+        self.cache.begin(source_path, digest)
+        if profiler.enabled:
+            profiler.begin('module', filepath)
+        try:
+            scope, warnings, _ = analyze(read_source(source_path), label,
+                                         builtin_context(), self, writer)
+            module = Instance('object', scope)
+        finally:
+            if profiler.enabled:
+                profiler.end()
+            self._in_progress.remove(filepath)
+            dependencies, complete = self.cache.end(
+                filepath, module, get_builtin_scopes(), self._references)
+        self.analyzed += 1
+        if filepath not in self._modules:
+            self._add(filepath, module, dependencies, complete)
+        if complete and writer is None:
+            self._warnings[filepath] = warnings
+        return module, warnings, complete
+
+    def check(self, filepath, writer=None):
+        """ Analyze a file that was given on the command line, reusing the
+            analysis if it was already imported. Returns its scope and
+            warnings. If a writer is given, the warnings are passed to it
+            instead, and are not kept for checking the file again. """
+        path = os.path.abspath(filepath)
+        if path in self._warnings:
+            self.saved += 1
+            if profiler.enabled:
+                profiler.reuse('module', path)
+            warnings = (self._warnings.pop(path) if writer is not None
+                        else self._warnings[path]).relabel(filepath, writer)
+            return self._modules[path].attributes, warnings
+        module, warnings, _ = self._analyze(path, path, file_digest(path),
+                                            filepath, writer)
+        return module.attributes, warnings
+
+    def sources(self):
+        """ Maps every source file that the modules depend on to its
+            digest when it was analyzed. """
+        sources = {}
+        for dependencies, _ in self._dependencies.itervalues():
+            sources.update(dependencies)
+        return sources
+
+    def invalidate(self, source_paths):
+        """ Forget the modules that depend on any of the given source files,
+            directly or through their imports, and the modules that saw an
+            import cycle. Returns the paths of the forgotten modules. """
+        changed = set(source_paths)
+        stale = set(path for path, (dependencies, complete)
+                    in self._dependencies.iteritems()
+                    if not complete or not changed.isdisjoint(dependencies))
+        stale_ids = set()
+        for path in stale:
+            module = self._modules.pop(path)
+            stale_ids.add(id(module))
+            if path in self._proxies:
+                stale_ids.add(id(self._proxies[path]))
+            del self._references[id(module)]
+            del self._references[id(module.attributes)]
+            del self._dependencies[path]
+            self._warnings.pop(path, None)
+        self._views = dict((key, value) for key, value
+                           in self._views.iteritems()
+                           if id(value[1]) not in stale_ids)
+        self._imported = dict((path, source) for path, source
+                              in self._imported.iteritems()
+                              if changed.isdisjoint(source))
+        self._locations = {}    # a new file may shadow a located module
+        return stale
+
+    def cache_stats(self):
+        return [('modules', self.loaded + self.saved + self.interfaces,
+                 self.analyzed)]
+
+    def report(self):
+        unused = len([path for path in self._proxies
+                      if path not in self._modules])
+        return ('{0} modules analyzed, {1} loaded from cache, {2} read from '
+                'interfaces, {3} analyses saved, {4} imports never used\n'
+                ).format(self.analyzed, self.loaded, self.interfaces,
+                         self.saved, unused)
+
+
+class ImportFailure(object):
+    """ The details of an import-failed warning. The importing file is
+        shown relative to the working directory when the warning is
+        written, so that the details are the same whether the file was
+        analyzed as an import or given on the command line. """
+
+    def __init__(self, name, filepath, error):
+        self.name = name
+        self.filepath = os.path.abspath(filepath)
+        self.error = error
+
+    def __str__(self):
+        return '{0} {1}\n{2}'.format(self.name, os.path.relpath(self.filepath),
+                                     self.error)
+
+
+def import_module(name, current_filepath, modules, warn):
     try:
-        source, filepath, is_package = import_source(name, current_filepath)
+        filepath, is_package = modules.locate(name, current_filepath)
     except RuntimeError as error:
-        warn('import-failed', name + ' ' + current_filepath + '\n' + str(error))
+        warn('import-failed', ImportFailure(name, current_filepath,
+                                            str(error)))
         return Unknown(), current_filepath, False
-
-    cache_filename = sha256(filepath + '~' + source).hexdigest()
-    cache_filepath = os.path.join(os.sep, os.environ['HOME'], '.pystarch',
-                                  __version__, cache_filename)
-
-    if False and os.path.exists(cache_filepath):
-        with open(cache_filepath, 'rb') as cache_file:
-            return pickle.load(cache_file), filepath, is_package
-    elif filepath in imported:
-        #i = imported.index(filepath)
-        #paths = ' -> '.join(imported[i:] + [filepath])
-        #print('CIRCULAR: ' + paths)
-        return Instance('object', Scope()), filepath, is_package
-    else:
-        imported.append(filepath)
-        scope, _, _ = analyze(source, filepath, imported=imported)
-        module = Instance('object', scope)
-        #try: os.makedirs(os.path.dirname(cache_filepath))
-        #except: pass
-        #with open(cache_filepath, 'wb') as cache_file:
-        #    import ipdb; ipdb.set_trace()
-        #    pickle.dump(module, cache_file, pickle.HIGHEST_PROTOCOL)
-        return module, filepath, is_package
+    return modules.load(filepath), filepath, is_package
 
 
 def import_chain(fully_qualified_name, asname, import_scope, current_filepath,
-                 imported, warn):
+                 modules, warn):
     scope = import_scope
     filepath = current_filepath
     is_package = True
     names = fully_qualified_name.split('.') if fully_qualified_name else [None]
-    for name in names:
+    for i, name in enumerate(names):
         if scope is None:
             warn('import-error', fully_qualified_name)
             return Unknown()
         if is_package:
             import_type, filepath, is_package = import_module(
-                name, filepath, imported, warn)
+                name, filepath, modules, warn)
             if asname is None:
-                scope.add(Symbol(name, import_type))
+                import_type = modules.bind(scope, name, import_type,
+                                           i < len(names) - 1)
+            # a module is only analyzed if a name is imported from it
             scope = (import_type.attributes if isinstance(import_type, Instance)
-                     else None)
+                     and i < len(names) - 1 else None)
         else:
             import_type = scope.get_type(name)
             scope = None
@@ -149,7 +424,7 @@ class ModuleVisitor(ScopeVisitor):
                                             node, category, details)
         for alias in node.names:
             import_chain(alias.name, alias.asname, scope, self._filepath,
-                         self._imported, warn)
+                         self._modules, warn)
 
     def visit_ImportFrom(self, node):
         filepath = get_path_for_level(self._filepath, node.level)
@@ -158,13 +433,13 @@ class ModuleVisitor(ScopeVisitor):
                                             node, category, details)
         for part in parts:
             import_type, filepath, is_package = import_module(
-                part, filepath, self._imported, warn)
+                part, filepath, self._modules, warn)
 
         for alias in node.names:
             symbol_name = alias.asname or alias.name
             if is_package:
                 symbol_type, _, _ = import_module(alias.name, filepath,
-                                                  self._imported, warn)
+                                                  self._modules, warn)
             else:
                 if isinstance(import_type, Instance):
                     symbol_type = import_type.attributes.get_type(alias.name)
@@ -176,25 +451,71 @@ class ModuleVisitor(ScopeVisitor):
             self._context.add(Symbol(symbol_name, symbol_type))
 
 
-def builtin_context():
-    filename = 'builtins.py'
-    context = Context()
+def builtins_path():
     this_dir = os.path.dirname(os.path.abspath(__file__))
-    with open(os.path.join(this_dir, filename)) as builtins_file:
-        source = builtins_file.read()
-    analyze(source, filename, context)
-    return context
+    return os.path.join(this_dir, 'builtins.py')
+
+
+_builtin_scopes = []
+
+
+def get_builtin_scopes():
+    # builtins.py is only analyzed once per process and the resulting scopes
+    # are frozen because they are shared by every module's context
+    if len(_builtin_scopes) == 0:
+        context = Context()
+        with open(builtins_path()) as builtins_file:
+            source = builtins_file.read()
+        # timed on its own, rather than as part of the module that is
+        # analyzed first
+        if profiler.enabled:
+            profiler.begin('module', 'builtins.py')
+        try:
+            analyze(source, 'builtins.py', context)
+        finally:
+            if profiler.enabled:
+                profiler.end()
+        for scope in context.layers():
+            scope.freeze()
+        _builtin_scopes.extend(context.layers())
+    return _builtin_scopes
+
+
+def builtin_context():
+    return Context(list(get_builtin_scopes()))
+
 
+_salt = []
 
-def analyze(source, filepath=None, context=None, imported=[]):
+
+def cache_salt():
+    if len(_salt) == 0:
+        _salt.append(__version__ + '~' + file_digest(builtins_path()))
+    return _salt[0]
+
+
+def default_module_cache():
+    directory = os.path.join(os.path.expanduser('~'), '.pystarch',
+                             __version__)
+    return ModuleCache(directory, cache_salt())
+
+
+module_cache = default_module_cache()
+
+
+def analyze(source, filepath=None, context=None, modules=None, writer=None):
+    """ If a writer is given, each warning is passed to it as soon as it is
+        found. """
     tree = ast.parse(source, filepath)
-    visitor = ModuleVisitor(filepath, context or builtin_context(), imported)
+    if modules is None:
+        modules = ModuleTable(module_cache)
+    visitor = ModuleVisitor(filepath, context or builtin_context(), modules,
+                            Warnings(filepath, writer))
     visitor.visit(tree)
     return visitor.report()
 
 
-def analysis(source, filepath=None, context=None, show_types=False):
-    scope, warnings, _ = analyze(source, filepath, context)
+def format_report(scope, warnings, show_types=False):
     warning_output = str(warnings)
     if show_types:
         scope_output = str(scope)
@@ -204,20 +525,347 @@ def analysis(source, filepath=None, context=None, show_types=False):
         return warning_output
 
 
+def analysis(source, filepath=None, context=None, show_types=False,
+             modules=None):
+    scope, warnings, _ = analyze(source, filepath, context, modules)
+    return format_report(scope, warnings, show_types)
+
+
+def find_source_files(paths):
+    filepaths = set()
+    for path in paths:
+        for match in (glob.glob(path) if glob.has_magic(path) else [path]):
+            if not os.path.isdir(match):
+                filepaths.add(match)
+                continue
+            for dirpath, dirnames, filenames in os.walk(match):
+                dirnames[:] = [x for x in dirnames if not x.startswith('.')]
+                filepaths.update(os.path.join(dirpath, filename)
+                                 for filename in filenames
+                                 if filename.endswith('.py'))
+    return sorted(filepaths)
+
+
+def join_reports(reports, show_types=False):
+    """ reports maps each checked file to its report. """
+    if show_types and len(reports) > 1:
+        return ''.join('{0}:\n{1}'.format(filepath, reports[filepath])
+                       for filepath in sorted(reports))
+    return ''.join(reports[filepath] for filepath in sorted(reports))
+
+
+def check_file(filepath, modules, writer=None):
+    """ Same as modules.check, but if the file can't be analyzed, its
+        warnings are an analysis-failed warning, so that the other files
+        of a run are still checked. The traceback goes to stderr. """
+    try:
+        return modules.check(filepath, writer)
+    except Exception as error:  # pylint: disable=broad-except
+        sys.stderr.write('{0}: {1}'.format(filepath, traceback.format_exc()))
+        modules.failed += 1
+        warnings = Warnings(filepath, writer)
+        warnings.fail(error)
+        return Scope(), warnings
+
+
+def check_files(filepaths, modules, show_types=False):
+    """ Analyze several files in one session and return a single report
+        with the files in sorted order. """
+    reports = {}
+    for filepath in sorted(filepaths):
+        scope, warnings = check_file(filepath, modules)
+        reports[filepath] = format_report(scope, warnings, show_types)
+    return join_reports(reports, show_types)
+
+
+def write_files(filepaths, modules, writer):
+    """ Analyze several files in one session and pass their warnings to the
+        writer as they are found, with the files in sorted order. """
+    for filepath in sorted(filepaths):
+        check_file(filepath, modules, writer)
+
+
+def module_imports(filepath, modules):
+    """ The paths of the modules that a module may import, resolved the
+        same way that ModuleVisitor resolves them. """
+    try:
+        tree = ast.parse(read_source(get_source_file(filepath)), filepath)
+    except Exception:   # pylint: disable=broad-except
+        return set()    # the analysis of the module reports the error
+    imports = set()
+
+    def locate(name, path):
+        try:
+            location = modules.locate(name, path)
+        except RuntimeError:
+            return None
+        imports.add(location[0])
+        return location
+
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            for alias in node.names:
+                path, is_package = filepath, True
+                for name in alias.name.split('.'):
+                    location = locate(name, path) if is_package else None
+                    if location is None:
+                        break
+                    path, is_package = location
+        elif isinstance(node, ast.ImportFrom):
+            path = get_path_for_level(filepath, node.level)
+            is_package = False
+            for part in node.module.split('.') if node.module else [None]:
+                path, is_package = locate(part, path) or (path, False)
+            if is_package:
+                for alias in node.names:
+                    locate(alias.name, path)
+    return imports
+
+
+def import_graph(filepaths, modules):
+    """ Maps the files to check, and every module they import, to the
+        modules that they import. """
+    graph = {}
+    pending = [(os.path.abspath(path), path) for path in filepaths]
+    while len(pending) > 0:
+        node, filepath = pending.pop()
+        if node not in graph:
+            graph[node] = module_imports(filepath, modules)
+            pending.extend((path, path) for path in graph[node])
+    return graph
+
+
+_worker_modules = []
+
+
+def _init_worker(cache):
+    _worker_modules.append(ModuleTable(cache))
+
+
+def _check_in_worker(node, filepath, show_types, records):
+    """ Runs in a pool process. Analyzes a module so that its summary is
+        cached for the modules that import it, and returns its report, or
+        the records of its warnings, if it is a file to check. """
+    modules = _worker_modules[-1]
+    counts = (modules.analyzed, modules.loaded, modules.saved,
+              modules.interfaces)
+    report = None
+    try:
+        if filepath is None:
+            modules.resolve(node)   # load() would defer the analysis
+        else:
+            scope, warnings = modules.check(filepath)
+            report = (warnings.records() if records else
+                      format_report(scope, warnings, show_types))
+    except Exception:   # pylint: disable=broad-except
+        return node, False, None, (0, 0, 0, 0)  # analyzed again serially
+    return node, True, report, (modules.analyzed - counts[0],
+                                modules.loaded - counts[1],
+                                modules.saved - counts[2],
+                                modules.interfaces - counts[3])
+
+
+def _check_parallel(filepaths, modules, jobs, show_types=False,
+                    records=False):
+    """ Analyzes modules in a pool of processes in dependency order, and
+        yields the files to check in sorted order with the results of
+        _check_in_worker, as soon as a file and all the files before it
+        are done. Files that must be checked serially are yielded with
+        None after the pool is done. """
+    get_builtin_scopes()    # analyzed once, before the pool forks
+    targets = dict((os.path.abspath(path), path) for path in filepaths)
+    order = sorted(filepaths)
+    position = 0
+    graph = import_graph(filepaths, modules)
+    serial = dependents(graph, cyclic_nodes(graph))
+    waiting = dict((node, set(graph[node]) - set([node]))
+                   for node in graph if node not in serial)
+    reports = {}
+    finished = Queue()
+    pool = multiprocessing.Pool(jobs, _init_worker, (modules.cache,))
+    try:
+        running = 0
+        while len(waiting) > 0 or running > 0:
+            ready = sorted(node for node, deps in waiting.iteritems()
+                           if len(deps) == 0)
+            for node in ready:
+                del waiting[node]
+                pool.apply_async(_check_in_worker,
+                                 (node, targets.get(node), show_types,
+                                  records),
+                                 callback=finished.put)
+                running += 1
+            node, ok, report, counts = finished.get()
+            running -= 1
+            if ok:
+                for deps in waiting.itervalues():
+                    deps.discard(node)
+                modules.analyzed += counts[0]
+                modules.loaded += counts[1]
+                modules.saved += counts[2]
+                modules.interfaces += counts[3]
+                if report is not None:
+                    reports[targets[node]] = report
+            else:
+                failed = dependents(graph, [node])
+                serial.update(failed)
+                for failed_node in failed:
+                    waiting.pop(failed_node, None)
+            while position < len(order) and order[position] in reports:
+                yield order[position], reports.pop(order[position])
+                position += 1
+    finally:
+        pool.close()
+        pool.join()
+
+    for filepath in order[position:]:
+        yield filepath, reports.pop(filepath, None)
+
+
+def check_files_parallel(filepaths, modules, show_types=False, jobs=2):
+    """ Same as check_files, but modules are analyzed by a pool of
+        processes in dependency order. A module's summary reaches the
+        modules that import it through the cache, so the cache of the
+        ModuleTable must be enabled. Import cycles and anything that
+        depends on them are analyzed serially afterwards, because the
+        result of a cycle depends on the order its modules are reached. """
+    reports = {}
+    for filepath, report in _check_parallel(filepaths, modules, jobs,
+                                            show_types=show_types):
+        if report is None:
+            scope, warnings = check_file(filepath, modules)
+            report = format_report(scope, warnings, show_types)
+        reports[filepath] = report
+    return join_reports(reports, show_types)
+
+
+def write_files_parallel(filepaths, modules, writer, jobs=2):
+    """ Same as write_files, but modules are analyzed as in
+        check_files_parallel. The warnings of each file are written when
+        it and the files before it are done. """
+    for filepath, records in _check_parallel(filepaths, modules, jobs,
+                                             records=True):
+        if records is None:
+            check_file(filepath, modules, writer)
+        else:
+            for record in records:
+                writer.write(record)
+
+
+def make_writer(output_format, stream):
+    if output_format == 'sarif':
+        return WRITERS[output_format](stream, NAME, __version__)
+    return WRITERS[output_format](stream)
+
+
+def run(options, args, modules):
+    source = None
+    if options.null:
+        args += [path for path in sys.stdin.read().split('\0') if path]
+    elif len(args) == 0:
+        source = sys.stdin.read()
+    filepaths = find_source_files(args)
+    if options.show_types:
+        write_report(source, filepaths, modules, options.jobs)
+        return
+    writer = make_writer(options.output_format, sys.stdout)
+    writer.begin()
+    try:
+        if source is not None:
+            analyze(source, '', modules=modules, writer=writer)
+        elif options.jobs > 1 and len(filepaths) > 0:
+            write_files_parallel(filepaths, modules, writer, options.jobs)
+        else:
+            write_files(filepaths, modules, writer)
+    finally:
+        writer.end()    # so that a crash leaves a complete log
+
+
+def write_report(source, filepaths, modules, jobs):
+    """ Writes the types of the top scope of each file before its warnings,
+        so a file is only written once it is done. """
+    if source is not None:
+        sys.stdout.write(analysis(source, '', show_types=True,
+                                  modules=modules))
+    elif jobs > 1:
+        sys.stdout.write(check_files_parallel(filepaths, modules, True, jobs))
+    else:
+        sys.stdout.write(check_files(filepaths, modules, True))
+
+
+def cache_stats(modules):
+    """ (name, hits, misses) of each cache that keeps counts. """
+    stats = modules.cache_stats()
+    stats.append(('function summaries', evaluator_stats['hits'],
+                  evaluator_stats['misses']))
+    stats.append(('expression results', node_results.hits,
+                  node_results.misses))
+    stats.append(('name lookups', lookup_stats['hits'],
+                  lookup_stats['misses']))
+    for name, cache in lattice_caches.iteritems():
+        stats.append((name.lstrip('_'), cache.hits, cache.misses))
+    return stats
+
+
 def main():
-    parser = optparse.OptionParser()
+    parser = optparse.OptionParser(
+        usage='%prog [options] [file | directory | glob]...')
     parser.add_option('-t', '--types', dest='show_types', default=False,
+                      action='store_true',
                       help='Show types of symbols defined in top scope')
+    parser.add_option('-0', '--null', dest='null', default=False,
+                      action='store_true',
+                      help='Read a NUL-separated list of files from stdin')
+    parser.add_option('--no-cache', dest='use_cache', default=True,
+                      action='store_false',
+                      help='Do not use cached summaries of imported modules')
+    parser.add_option('--stats', dest='show_stats', default=False,
+                      action='store_true',
+                      help='Print module statistics to stderr')
+    parser.add_option('-j', '--jobs', dest='jobs', default=1, type='int',
+                      help='Number of processes that analyze modules')
+    parser.add_option('--profile', dest='profile', default=False,
+                      action='store_true',
+                      help='Print the functions, classes and modules that '
+                      'take the most time, and cache hit rates, to stderr')
+    parser.add_option('-f', '--format', dest='output_format', default='text',
+                      type='choice', choices=sorted(WRITERS),
+                      help='Format of the warnings: ' + ', '.join(
+                          sorted(WRITERS)) + ' (default: text)')
     options, args = parser.parse_args()
-    if len(args) == 0:
-        filepath = ''
-        source = sys.stdin.read()
-    else:
-        filepath = args[0]
-        with open(filepath) as source_file:
-            source = source_file.read()
-    #sys.stdout.write(analysis(source, filepath, Context()))
-    sys.stdout.write(analysis(source, filepath, show_types=options.show_types))
+    if options.show_types and options.output_format != 'text':
+        parser.error('-t is only supported with the text format')
+    cache = module_cache if options.use_cache else None
+    spool = None
+    if options.jobs > 1 and cache is None:
+        # the processes need a cache to pass summaries to each other, so
+        # use one that only lasts for this run
+        spool = tempfile.mkdtemp(prefix='pystarch-')
+        cache = ModuleCache(spool, cache_salt())
+    modules = ModuleTable(cache)
+    profiler.enabled = options.profile
+    try:
+        run(options, args, modules)
+    finally:
+        if spool is not None:
+            shutil.rmtree(spool, ignore_errors=True)
+        if options.profile:
+            sys.stderr.write(profiler.report(cache_stats(modules)))
+    if options.show_stats:
+        sys.stderr.write(modules.report())
+        sys.stderr.write('{0} function calls reused, {1} evaluated\n'.format(
+            evaluator_stats['hits'], evaluator_stats['misses']))
+        sys.stderr.write('{0} expression results reused, {1} computed\n'
+                         .format(node_results.hits, node_results.misses))
+        sys.stderr.write('{0} name lookups reused, {1} searched\n'.format(
+            lookup_stats['hits'], lookup_stats['misses']))
+        sys.stderr.write('{0} constant folds abandoned\n'.format(
+            fold_stats['abandoned']))
+        for name, cache in lattice_caches.iteritems():
+            sys.stderr.write('{0}: {1} results reused, {2} computed\n'.format(
+                name.lstrip('_'), cache.hits, cache.misses))
+    if modules.failed > 0:
+        sys.exit(1)
 
 
 if __name__ == '__main__':
@@ -1,24 +1,50 @@
 import os
+import sys
+import traceback
+import multiprocessing
 from flask import Flask, request, render_template
-from subprocess import Popen, PIPE
+
+# appended so that builtins.py can't shadow the builtins module of future
+sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+import main     # pylint: disable=wrong-import-position
+from warning import format_message  # pylint: disable=wrong-import-position
 
 app = Flask(__name__)
+_pool = None
+
+
+def warm_up():
+    # each worker analyzes builtins.py once, before its first request
+    main.get_builtin_scopes()
+
+
+def analyze_in_worker(source):
+    try:
+        _, warnings, _ = main.analyze(source, '')
+        return warnings.records(), True
+    except Exception:   # pylint: disable=broad-except
+        return traceback.format_exc(), False
+
+
+def get_pool():
+    """ The worker pool, created on the first request so that it exists
+        under any WSGI server and not only when run as a script. """
+    global _pool    # pylint: disable=global-statement
+    if _pool is None:
+        workers = int(os.environ.get('PYSTARCH_WORKERS', 0)) or None
+        _pool = multiprocessing.Pool(workers, warm_up)
+    return _pool
 
 
 def analyze(source):
-    script_dir = os.path.dirname(os.path.realpath(__file__))
-    main_path = os.path.join(os.path.dirname(script_dir), 'main.py')
-    process = Popen(['python2', main_path],
-                    stdin=PIPE, stdout=PIPE, stderr=PIPE)
-    stdout, stderr = process.communicate(source)
-    return (stdout, True) if process.returncode == 0 else (stderr, False)
+    return get_pool().apply(analyze_in_worker, (source.encode('utf-8'),))
 
 
-def format_output(output):
+def format_output(records):
     mapping = {}
-    for line in output.splitlines():
-        line_number = int(line.split()[0].split(':')[1])
-        line_text = line[line.index(' ')+1:]
+    for record in records:
+        line_number = record['line']
+        line_text = format_message(record)
         mapping[line_number] = (mapping[line_number] + '; ' + line_text
                                 if line_number in mapping else line_text)
     if len(mapping) == 0:
@@ -44,4 +70,5 @@ def index():
 
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=4000, debug=True)
+    # the reloader would run the app in a second process with its own pool
+    app.run(host='0.0.0.0', port=4000, debug=True, use_reloader=False)
@@ -1,7 +1,3 @@
 #!/bin/bash
-for path in testcases/*.py
-do
-    filename=$(basename $path)
-    golden=${filename%.*}.out
-    python2 ../main.py $path > golden/$golden
-done
+# regenerates the golden files of the given testcases, or of all of them
+cd "$(dirname "$0")" && python2 run.py --regolden "$@"
@@ -1,33 +1,158 @@
 import sys
 import os
+import signal
+import optparse
+import unittest
+import traceback
+import multiprocessing
+from timeit import default_timer
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from main import analysis
+from main import analysis, get_builtin_scopes, ModuleTable
+from backend import evaluator_stats
 from difflib import unified_diff
 
+# seconds that the parent waits for a test after its timeout before it
+# gives up on the process running it
+GRACE = 5
 
-def main():
-    filenames = os.listdir('testcases')
-    python_filenames = [x for x in filenames if x.endswith('.py')]
-    for filename in python_filenames:
-        name, _ = os.path.splitext(filename)
-        filepath = os.path.join('testcases', filename)
-        golden_path = os.path.join('golden', name + '.out')
-        if not os.path.exists(golden_path):
-            print(name + ': MISSING GOLDEN FILE')
-            continue
+
+class Timeout(BaseException):
+    """ Not an Exception, so that the analyzer can't catch it. """
+
+
+def _alarm(signum, frame):
+    raise Timeout()
+
+
+def init_worker():
+    # builtins are analyzed once per process, before the first test
+    signal.signal(signal.SIGALRM, _alarm)
+    get_builtin_scopes()
+
+
+def run_test(args):
+    """ Runs in a pool process. Returns the name of the test, its output
+        or None, the error if there is one, its time in seconds and the
+        number of function bodies that were evaluated. """
+    name, timeout = args
+    filepath = os.path.join('testcases', name + '.py')
+    evaluations = evaluator_stats['misses']
+    start = default_timer()
+    output, error = None, None
+    signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
         with open(filepath) as source_file:
             source = source_file.read()
-        output = analysis(source, filepath, show_types=True)
-        with open(golden_path) as golden_file:
-            golden_output = golden_file.read()
-        if output == golden_output:
-            print(name + ': PASSED')
+        # imports are analyzed without the cache in ~/.pystarch, so that
+        # the result does not depend on earlier runs
+        output = analysis(source, filepath, show_types=True,
+                          modules=ModuleTable())
+    except Timeout:
+        error = 'TIMEOUT after {0} seconds'.format(timeout)
+    except Exception:   # pylint: disable=broad-except
+        error = traceback.format_exc()
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+    return (name, output, error, default_timer() - start,
+            evaluator_stats['misses'] - evaluations)
+
+
+def run_tests(tests, jobs):
+    """ Yields the result of each test in order. The alarm can't interrupt
+        a test that is stuck in C code, such as folding a huge number, so
+        a test that is still running after its timeout and the grace period
+        is reported as a timeout and the pool is replaced. """
+    queue = list(tests)
+    pending = []    # (test, async result, deadline)
+    pool = multiprocessing.Pool(jobs, init_worker)
+    try:
+        while len(queue) > 0 or len(pending) > 0:
+            # each test starts at once, since no more run than there are
+            # processes
+            while len(queue) > 0 and len(pending) < jobs:
+                test = queue.pop(0)
+                pending.append((test, pool.apply_async(run_test, (test,)),
+                                default_timer() + test[1] + GRACE))
+            test, result, deadline = pending.pop(0)
+            try:
+                yield result.get(max(0, deadline - default_timer()))
+            except multiprocessing.TimeoutError:
+                pool.terminate()
+                pool.join()
+                pool = multiprocessing.Pool(jobs, init_worker)
+                # the tests that were still running start again
+                queue = [x[0] for x in pending if not x[1].ready()] + queue
+                pending = [x for x in pending if x[1].ready()]
+                yield (test[0], None, 'TIMEOUT after {0} seconds, in a '
+                       'process that had to be stopped'.format(test[1]),
+                       test[1] + GRACE, 0)
+    finally:
+        pool.close()
+        pool.join()
+
+
+def check(name, output):
+    """ Returns the lines to print for a test that ran. """
+    golden_path = os.path.join('golden', name + '.out')
+    if not os.path.exists(golden_path):
+        return 'MISSING GOLDEN FILE', []
+    with open(golden_path) as golden_file:
+        golden_output = golden_file.read()
+    if output == golden_output:
+        return 'PASSED', []
+    return 'FAILED', list(unified_diff(golden_output.splitlines(),
+                                       output.splitlines()))
+
+
+def main():
+    parser = optparse.OptionParser(usage='%prog [options] [testcase]...')
+    parser.add_option('-j', '--jobs', dest='jobs', type='int',
+                      default=multiprocessing.cpu_count(),
+                      help='Number of processes that run tests')
+    parser.add_option('--timeout', dest='timeout', type='float', default=60,
+                      help='Seconds after which a test fails')
+    parser.add_option('--regolden', dest='regolden', default=False,
+                      action='store_true',
+                      help='Write the output of each test to its golden file')
+    options, args = parser.parse_args()
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    names = sorted(os.path.splitext(x)[0] for x in os.listdir('testcases')
+                   if x.endswith('.py'))
+    if len(args) > 0:
+        names = [os.path.splitext(os.path.basename(x))[0] for x in args]
+
+    get_builtin_scopes()    # analyzed once, before the pools fork
+    failures = 0
+    start = default_timer()
+    tests = [(name, options.timeout) for name in names]
+    for name, output, error, seconds, evaluations in run_tests(
+            tests, options.jobs):
+        timing = '({0:.0f} ms, {1} evaluations)'.format(seconds * 1e3,
+                                                       evaluations)
+        if error is not None:
+            failures += 1
+            print('{0}: ERROR {1}'.format(name, timing))
+            print(error)
+        elif options.regolden:
+            golden_path = os.path.join('golden', name + '.out')
+            with open(golden_path, 'w') as golden_file:
+                golden_file.write(output)
+            print('{0}: WRITTEN {1}'.format(name, timing))
         else:
-            print(name + ': FAILED')
-            diffs = unified_diff(golden_output.splitlines(),
-                output.splitlines())
+            result, diffs = check(name, output)
+            failures += result != 'PASSED'
+            print('{0}: {1} {2}'.format(name, result, timing))
             for diff in diffs:
                 print(diff)
+        sys.stdout.flush()
+    print('{0} tests, {1} failed, {2:.1f} seconds'.format(
+        len(names), failures, default_timer() - start))
+    if len(args) == 0 and not options.regolden:
+        # the tests of test_*.py check runs of main.py on whole projects
+        suite = unittest.defaultTestLoader.discover('.', 'test_*.py')
+        result = unittest.TextTestRunner(verbosity=2).run(suite)
+        failures += len(result.failures) + len(result.errors)
+    sys.exit(1 if failures > 0 else 0)
 
 
 if __name__ == '__main__':
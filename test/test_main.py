@@ -0,0 +1,493 @@
+""" Tests of checking whole projects: the module cache, parallel checking,
+    the daemon and the server, output formats, interface files and lazy
+    imports. Each test writes a small project to a temporary directory and
+    runs main.py on it with its own home directory, so that ~/.pystarch is
+    never shared. Run by run.py after the golden tests, or with
+    "python2.7 -m unittest test_main". """
+import os
+import sys
+import json
+import time
+import pickle
+import shutil
+import pickletools
+import tempfile
+import unittest
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class ProjectTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = os.path.realpath(
+            tempfile.mkdtemp(prefix='pystarch-test-'))
+        self.home = os.path.join(self.directory, 'home')
+        self.project = os.path.join(self.directory, 'project')
+        os.makedirs(self.home)
+        os.makedirs(self.project)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def write(self, files):
+        for name, source in files.items():
+            path = os.path.join(self.project, name)
+            if not os.path.isdir(os.path.dirname(path)):
+                os.makedirs(os.path.dirname(path))
+            with open(path, 'w') as source_file:
+                source_file.write(source)
+
+    def remove(self, name):
+        os.remove(os.path.join(self.project, name))
+
+    def run_script(self, script, *args):
+        """ The output and error output of a script of the repository run
+            in the project directory. """
+        return self.run_python(os.path.join(ROOT, script), *args)
+
+    def run_python(self, *args):
+        process = self.start(*args)
+        output, error = process.communicate()
+        self.assertEqual(process.returncode, 0, error)
+        return output, error
+
+    def start(self, *args):
+        environment = dict(os.environ, HOME=self.home)
+        return subprocess.Popen(
+            [sys.executable] + list(args), cwd=self.project, env=environment,
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+    def main(self, *args):
+        return self.run_script('main.py', *args)[0]
+
+    def start_daemon(self):
+        """ The process of a daemon that polls for changes, and its socket
+            once it is listening. """
+        socket_path = os.path.join(self.directory, 'daemon.sock')
+        daemon = self.start(os.path.join(ROOT, 'daemon.py'), '--socket',
+                            socket_path, '--interval', '0.1')
+        for _ in range(100):
+            if os.path.exists(socket_path):
+                break
+            time.sleep(0.05)
+        return daemon, socket_path
+
+    def stop_daemon(self, daemon, socket_path):
+        self.run_script('client.py', '--socket', socket_path, '--stop')
+        daemon.communicate()
+        self.assertEqual(daemon.returncode, 0)
+
+    def main_failing(self, *args):
+        """ The output and error output of main.py on files that it fails
+            to analyze. """
+        process = self.start(os.path.join(ROOT, 'main.py'), *args)
+        output, error = process.communicate()
+        self.assertEqual(process.returncode, 1, error)
+        return output, error
+
+    def stats(self, *args):
+        """ The output of main.py and the line of its --stats report that
+            counts the modules. """
+        output, error = self.run_script('main.py', '--stats', *args)
+        lines = [line for line in error.splitlines()
+                 if 'modules analyzed' in line]
+        return output, lines[0]
+
+    def evaluations(self, name):
+        """ How many function bodies main.py evaluated. """
+        _, error = self.run_script('main.py', '--no-cache', '--stats', name)
+        line = [x for x in error.splitlines() if 'function calls' in x][0]
+        return int(line.split()[-2])
+
+
+# util is imported by two modules, one of them through mid
+PROJECT = {
+    'a.py': 'import util\nx = util.f(1)\n',
+    'b.py': 'import mid\ny = mid.g(2)\n',
+    'mid.py': 'import util\ndef g(n):\n    return util.f(n)\n',
+    'util.py': 'def f(n):\n    return n + 1\n',
+}
+
+CHANGED_UTIL = {'util.py': 'def f(n):\n    return str(n)\n'}
+
+
+class CacheTest(ProjectTestCase):
+
+    def test_warm_run_loads_imports(self):
+        self.write(PROJECT)
+        cold, counts = self.stats('-t', 'a.py', 'b.py')
+        self.assertIn('0 loaded from cache', counts)
+        warm, counts = self.stats('-t', 'a.py', 'b.py')
+        self.assertEqual(warm, cold)
+        self.assertIn('2 modules analyzed, 2 loaded from cache', counts)
+
+    def test_changed_import(self):
+        self.write(PROJECT)
+        self.main('-t', 'a.py', 'b.py')
+        self.write(CHANGED_UTIL)
+        warm, counts = self.stats('-t', 'a.py', 'b.py')
+        self.assertEqual(warm, self.main('--no-cache', '-t', 'a.py', 'b.py'))
+        self.assertIn('y Str', warm)    # changed through mid
+        self.assertIn('0 loaded from cache', counts)
+
+
+class ModuleTableTest(ProjectTestCase):
+
+    def test_each_module_analyzed_once(self):
+        self.write(PROJECT)
+        files = sorted(PROJECT)
+        output, counts = self.stats('--no-cache', *files)
+        self.assertIn('4 modules analyzed', counts)
+        self.assertIn('2 analyses saved', counts)
+        self.assertEqual(output, ''.join(self.main('--no-cache', name)
+                                         for name in files))
+
+    def test_builtins_analyzed_once(self):
+        self.write(PROJECT)
+        _, error = self.run_script('main.py', '--no-cache', '--profile',
+                                   *sorted(PROJECT))
+        rows = [line.split() for line in error.splitlines()
+                if line.endswith(' builtins.py')]
+        self.assertEqual(rows[0][:3], ['module', '1', '0'])
+
+
+class ClassTest(ProjectTestCase):
+
+    def test_each_method_checked_once(self):
+        self.write({
+            'empty.py': '',
+            'model.py': ('class Model(object):\n'
+                         '    def __init__(self, a):\n'
+                         '        self.a = a\n'
+                         '    def first(self, x):\n'
+                         '        return self.second(x)\n'
+                         '    def second(self, y):\n'
+                         '        return y * 2\n'
+                         '    def third(self):\n'
+                         '        return self.a\n'),
+        })
+        # each method once, and second again when first calls it
+        self.assertEqual(self.evaluations('model.py') -
+                         self.evaluations('empty.py'), 5)
+
+
+class SummaryTest(ProjectTestCase):
+
+    def chain(self, size):
+        """ A module of functions where each one calls the next. """
+        lines = ['def f{0}(a, s):'.format(size - 1), '    return a * 2']
+        for i in reversed(range(size - 1)):
+            lines.append('def f{0}(a, s):'.format(i))
+            lines.append('    return f{0}(a + 1, s) + len(s)'.format(i + 1))
+        lines.append('r = f0(1, "s")')
+        name = 'chain{0}.py'.format(size)
+        self.write({name: '\n'.join(lines) + '\n'})
+        return self.evaluations(name)
+
+    def test_call_chain_grows_linearly(self):
+        # defining a function doesn't invalidate the summaries of the
+        # functions defined before it
+        small, medium, large = self.chain(8), self.chain(16), self.chain(32)
+        self.assertEqual(large - medium, 2 * (medium - small))
+
+
+class ParallelTest(ProjectTestCase):
+
+    FILES = dict(PROJECT, **{
+        'c.py': 'import cycle_a\nz = cycle_a.h()\n',
+        'cycle_a.py': 'import cycle_b\ndef h():\n    return cycle_b.k\n',
+        'cycle_b.py': 'import cycle_a\nk = 1 + None\n',
+        'pkg/__init__.py': 'from util import f\n',
+        'pkg/d.py': 'import mid\nw = mid.g(None)\n',
+    })
+
+    def test_same_output_as_serial(self):
+        self.write(self.FILES)
+        for args in [('-t',), ()]:
+            serial = self.main('--no-cache', *(args + ('.',)))
+            self.assertEqual(self.main('--no-cache', '-j', '3',
+                                       *(args + ('.',))), serial)
+            self.assertEqual(self.main('-j', '3', *(args + ('.',))), serial)
+            self.assertEqual(self.main('-j', '3', *(args + ('.',))), serial)
+
+
+class DaemonTest(ProjectTestCase):
+
+    def test_checks_again_after_a_change(self):
+        self.write(PROJECT)
+        daemon, socket_path = self.start_daemon()
+        try:
+            check = lambda: self.run_script('client.py', '--socket',
+                                            socket_path, '-t', 'a.py',
+                                            'b.py')[0]
+            self.assertEqual(check(), self.main('-t', 'a.py', 'b.py'))
+            self.assertEqual(check(), self.main('-t', 'a.py', 'b.py'))
+            self.write(CHANGED_UTIL)
+            self.assertEqual(check(), self.main('-t', 'a.py', 'b.py'))
+            self.remove('mid.py')
+            self.assertEqual(check(), self.main('-t', 'a.py', 'b.py'))
+        finally:
+            self.stop_daemon(daemon, socket_path)
+
+
+class LazyImportTest(ProjectTestCase):
+
+    def test_unused_imports_are_not_analyzed(self):
+        self.write(dict(PROJECT, **{
+            'e.py': 'import mid\nimport missing\nx = mid\n',
+        }))
+        output, counts = self.stats('--no-cache', 'e.py')
+        self.assertIn('1 modules analyzed', counts)
+        self.assertIn('1 imports never used', counts)
+        self.assertIn('e.py:2 import-failed "Import" (missing', output)
+
+    def test_used_imports_are_analyzed(self):
+        self.write(PROJECT)
+        output, counts = self.stats('--no-cache', '-t', 'b.py')
+        self.assertIn('3 modules analyzed', counts)
+        self.assertIn('0 imports never used', counts)
+        self.assertIn('y Num', output)
+
+    def test_unused_dotted_import_is_not_analyzed(self):
+        self.write({
+            'pkg/__init__.py': 'top = 1\n',
+            'pkg/sub/__init__.py': '',
+            'pkg/sub/m.py': 'x = 1\n',
+            'f.py': 'import pkg.sub.m\n',
+            'g.py': 'import pkg.sub.m\ny = pkg.sub.m.x\nz = pkg.top\n',
+        })
+        _, counts = self.stats('--no-cache', 'f.py')
+        self.assertIn('1 modules analyzed', counts)
+        self.assertIn('3 imports never used', counts)
+        # the package in the middle is never used by g.py
+        output, counts = self.stats('--no-cache', '-t', 'g.py')
+        self.assertIn('3 modules analyzed', counts)
+        self.assertIn('y Num 1', output)
+        self.assertIn('z Num 1', output)
+
+
+class ImportFailedTest(ProjectTestCase):
+
+    FILES = {
+        'a.py': 'from pkg.sub import m\ny = m.x\n',
+        'pkg/__init__.py': '',
+        'pkg/sub/__init__.py': '',
+        'pkg/sub/m.py': 'import util\nx = 1\n',
+    }
+
+    def test_same_output_cold_warm_and_parallel(self):
+        self.write(self.FILES)
+        cold = self.main('--no-cache', 'a.py', 'pkg/sub/m.py')
+        self.assertIn('import-failed "Import" (util pkg/sub/m.py\n', cold)
+        self.assertEqual(self.main('a.py', 'pkg/sub/m.py'), cold)
+        self.assertEqual(self.main('a.py', 'pkg/sub/m.py'), cold)
+        self.assertEqual(self.main('pkg/sub/m.py', 'a.py'), cold)
+        self.assertEqual(self.main('-j', '3', 'a.py', 'pkg/sub/m.py'), cold)
+        self.assertEqual(self.main('--no-cache', '-j', '3', 'a.py',
+                                   'pkg/sub/m.py'), cold)
+
+
+class FailureTest(ProjectTestCase):
+
+    FILES = {
+        'a.py': 'x = 1 + None\n',
+        'crash.py': ('class A(object):\n'
+                     '    @staticmethod\n'
+                     '    def f():\n'
+                     '        pass\n'),
+        'z.py': 'import a\ny = len(a.x)\n',
+    }
+
+    def test_other_files_are_checked(self):
+        self.write(self.FILES)
+        files = ('a.py', 'crash.py', 'missing.py', 'z.py')
+        output, error = self.main_failing('--no-cache', *files)
+        self.assertEqual([line.split(' (')[0] for line in output.splitlines()],
+                         ['a.py:1 type-error "None"',
+                          'crash.py:1 analysis-failed "IndexError"',
+                          'missing.py:1 analysis-failed "IOError"',
+                          'z.py:2 type-error ".x"'])
+        self.assertIn('"IOError" (No such file or directory: missing.py)',
+                      output)
+        self.assertIn('IndexError: list index out of range', error)
+        self.assertEqual(self.main_failing('--no-cache', '-j', '3',
+                                           *files)[0], output)
+        self.assertEqual(self.main_failing(*files)[0], output)
+        self.assertEqual(self.main_failing(*files)[0], output)
+        types = self.main_failing('--no-cache', '-t', *files)[0]
+        self.assertIn('crash.py:\ncrash.py:1 analysis-failed', types)
+        self.assertIn('z.py:\na Instance(object)\ny Num\n', types)
+
+
+class InterfaceTest(ProjectTestCase):
+
+    FILES = {
+        'lib/__init__.py': '',
+        'lib/dep.py': 'def helper(x):\n    return x + 1\n',
+        'lib/mod.py': ('import dep\n'
+                       'def run(y):\n'
+                       '    return dep.helper(y)\n'
+                       'value = run(2)\n'),
+        't.py': 'from lib import mod\nz = mod.value\nw = mod.run(1)\n',
+    }
+
+    def test_read_instead_of_analysis(self):
+        self.write(self.FILES)
+        analyzed = self.main('--no-cache', '-t', 't.py')
+        self.run_script('interfaces.py', '--no-cache', 'lib/mod.py')
+        output, counts = self.stats('--no-cache', '-t', 't.py')
+        self.assertEqual(output, analyzed)
+        self.assertIn('1 read from interfaces', counts)
+
+    def test_functions_are_stubbed(self):
+        self.write(self.FILES)
+        self.write({'lib/ident.py': ('def ident(x):\n    return x\n'
+                                     'class C(object):\n'
+                                     '    def __init__(self):\n'
+                                     '        self.a = 1\n'),
+                    'u.py': ('from lib import ident\n'
+                             'a = ident.ident(1)\nb = ident.ident("s")\n'
+                             'c = ident.C().a\n')})
+        self.run_script('interfaces.py', '--no-cache', 'lib/')
+        for name in ['ident', 'mod']:
+            path = os.path.join(self.project, 'lib', name + '.pysi')
+            with open(path, 'rb') as interface_file:
+                summary = pickle.load(interface_file)['summary']
+            names = set(argument for opcode, argument, _
+                        in pickletools.genops(summary)
+                        if opcode.name == 'GLOBAL')
+            self.assertIn('backend.stub StubEvaluator', names)
+            self.assertNotIn('backend.function FunctionEvaluator', names)
+            self.assertEqual([x for x in names if x.startswith('_ast ')], [])
+        self.assertEqual(self.main('--no-cache', '-t', 'u.py'),
+                         'a Unknown\nb Unknown\nc Num 1\n'
+                         'ident Instance(object)\n')
+
+    def test_changed_source(self):
+        self.write(self.FILES)
+        self.run_script('interfaces.py', '--no-cache', 'lib/mod.py')
+        self.write({'lib/mod.py': 'value = "s"\ndef run(y):\n    return y\n'})
+        output, counts = self.stats('--no-cache', '-t', 't.py')
+        self.assertIn('z Str s\n', output)
+        self.assertIn('0 read from interfaces', counts)
+
+    def test_changed_dependency(self):
+        self.write(self.FILES)
+        self.run_script('interfaces.py', '--no-cache', 'lib/mod.py')
+        self.write({'lib/dep.py': 'def helper(x):\n    return "s"\n'})
+        output, counts = self.stats('--no-cache', '-t', 't.py')
+        self.assertIn('w Str\n', output)
+        self.assertIn('0 read from interfaces', counts)
+
+    def test_deleted_dependency(self):
+        self.write(self.FILES)
+        self.run_script('interfaces.py', '--no-cache', 'lib/mod.py')
+        self.remove('lib/dep.py')
+        output, counts = self.stats('--no-cache', '-t', 't.py')
+        self.assertIn('w Unknown\n', output)
+        self.assertIn('0 read from interfaces', counts)
+
+
+class FormatTest(ProjectTestCase):
+
+    FILES = {
+        'a.py': 'x = 1 + None\ny = len(1)\n',
+        'b.py': 'import a\nz = a.x + "s"\n',
+        'crash.py': ('class A(object):\n'
+                     '    @staticmethod\n'
+                     '    def f():\n'
+                     '        pass\n'),
+    }
+
+    def test_formats_have_the_same_warnings(self):
+        self.write(self.FILES)
+        text = self.main('a.py', 'b.py').splitlines()
+        records = [json.loads(line) for line
+                   in self.main('-f', 'jsonl', 'a.py', 'b.py').splitlines()]
+        lines = ['{0}:{1} {2} "{3}"'.format(record['file'], record['line'],
+                                             record['category'],
+                                             record['symbol'])
+                 for record in records]
+        self.assertEqual(lines, [line.split(' (')[0] for line in text])
+        log = json.loads(self.main('-f', 'sarif', '-j', '2', 'a.py', 'b.py'))
+        self.assertEqual(len(log['runs'][0]['results']), len(text))
+
+    def test_sarif_is_complete_after_a_crash(self):
+        self.write(self.FILES)
+        output, error = self.main_failing('--no-cache', '-f', 'sarif',
+                                          'a.py', 'crash.py')
+        self.assertIn('Traceback', error)
+        results = json.loads(output)['runs'][0]['results']
+        self.assertEqual([result['ruleId'] for result in results],
+                         ['type-error', 'type-error', 'analysis-failed'])
+
+    def test_daemon_formats(self):
+        self.write(self.FILES)
+        daemon, socket_path = self.start_daemon()
+        try:
+            for args in [(), ('-f', 'jsonl'), ('-f', 'sarif')]:
+                output, _ = self.run_script('client.py', '--socket',
+                                            socket_path, 'a.py', 'b.py',
+                                            *args)
+                self.assertEqual(output, self.main('a.py', 'b.py', *args))
+        finally:
+            self.stop_daemon(daemon, socket_path)
+
+
+class ProfileTest(ProjectTestCase):
+
+    def test_builtins_are_timed_on_their_own(self):
+        self.write({'a.py': 'x = 1\n'})
+        _, error = self.run_script('main.py', '--no-cache', '--profile',
+                                   'a.py')
+        modules = [line.split()[1:3] + line.split()[5:] for line
+                   in error.splitlines() if line.startswith('module ')]
+        self.assertEqual(sorted(modules),
+                         [['1', '0', os.path.join(self.project, 'a.py')],
+                          ['1', '0', 'builtins.py']])
+
+    def test_name_lookups_are_counted(self):
+        self.write({'a.py': 'g = 1\ndef f(x):\n    return x + g\n'
+                            'y = f(1) + f(g)\n'})
+        _, error = self.run_script('main.py', '--no-cache', '--profile',
+                                   '--stats', 'a.py')
+        lines = error.splitlines()
+        counts = [line.split()[2:4] for line in lines
+                  if line.startswith('name lookups ')]
+        self.assertEqual(len(counts), 1)
+        self.assertGreater(int(counts[0][0]), 0)
+        self.assertIn('{0} name lookups reused, {1} searched'.format(
+            *counts[0]), lines)
+
+
+SERVER_CLIENT = """
+import sys
+try:
+    import flask
+except ImportError:
+    sys.exit(sys.stdout.write('skip'))
+sys.path.insert(0, sys.argv[1])
+import server
+client = server.app.test_client()
+for source in sys.argv[2:]:
+    response = client.post('/process', data={'source': source})
+    sys.stdout.write('{0} {1}'.format(response.status_code, response.data))
+"""
+
+
+class ServerTest(ProjectTestCase):
+
+    def test_process_without_running_as_script(self):
+        output, _ = self.run_python('-c', SERVER_CLIENT,
+                                    os.path.join(ROOT, 'server'),
+                                    'x = 1 + None\n', 'x = 1\n')
+        if output == 'skip':
+            self.skipTest('flask is not installed')
+        self.assertEqual(output, '200 type-error "None" (NoneType vs Num)\n'
+                                 '200 No errors')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,20 @@
+x01 = 2 ** 10
+x02 = 10 ** 10 ** 9
+x03 = 'a' * 10
+x04 = 'a' * 10 ** 10
+x05 = x03 * 10 ** 9
+x06 = 1 << 10
+x07 = 1 << 10 ** 9
+x08 = 10 ** 100 * 10 ** 100
+x09 = x04 + 'b'
+x10 = 1 / 0
+x11 = 10.0 ** 1000
+x12 = (-1) ** 10 ** 9
+x13 = x02 == x02
+x14 = '%5d' % 1
+x15 = '%0999999999d' % 1
+x16 = '%.999999999f' % 1.0
+x17 = '%*d' % (10 ** 9, 1)
+x18 = '%(a)999999999s' % {'a': 1}
+x19 = '%s%s' % ('a' * 60000, 'a' * 60000)
+x20 = '%%999999999d %d' % 1
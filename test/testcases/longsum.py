@@ -0,0 +1,37 @@
+a = 1
+b = 2
+c = 3
+s = 'y'
+
+# 200 terms
+total = (a + b + 1 + c + a + b + 1 + c + a + b + 1 + c + a + b + 1 + c + a +
+         b + 1 + c + a + b + 1 + c + a + b + 1 + c + a + b + 1 + c + a + b +
+         1 + c + a + b + 1 + c + a + b + 1 + c + a + b + 1 + c + a + b + 1 +
+         c + a + b + 1 + c + a + b + 1 + c + a + b + 1 + c + a + b + 1 + c +
+         a + b + 1 + c + a + b + 1 + c + a + b + 1 + c + a + b + 1 + c + a +
+         b + 1 + c + a + b + 1 + c + a + b + 1 + c + a + b + 1 + c + a + b +
+         1 + c + a + b + 1 + c + a + b + 1 + c + a + b + 1 + c + a + b + 1 +
+         c + a + b + 1 + c + a + b + 1 + c + a + b + 1 + c + a + b + 1 + c +
+         a + b + 1 + c + a + b + 1 + c + a + b + 1 + c + a + b + 1 + c + a +
+         b + 1 + c + a + b + 1 + c + a + b + 1 + c + a + b + 1 + c + a + b +
+         1 + c + a + b + 1 + c + a + b + 1 + c + a + b + 1 + c + a + b + 1 +
+         c + a + b + 1 + c + a + b + 1 + c + a + b + 1 + c)
+
+# 200 terms
+text = (s + 'x' + s + 'x' + s + 'x' + s + 'x' + s + 'x' + s + 'x' + s + 'x' +
+        s + 'x' + s + 'x' + s + 'x' + s + 'x' + s + 'x' + s + 'x' + s + 'x' +
+        s + 'x' + s + 'x' + s + 'x' + s + 'x' + s + 'x' + s + 'x' + s + 'x' +
+        s + 'x' + s + 'x' + s + 'x' + s + 'x' + s + 'x' + s + 'x' + s + 'x' +
+        s + 'x' + s + 'x' + s + 'x' + s + 'x' + s + 'x' + s + 'x' + s + 'x' +
+        s + 'x' + s + 'x' + s + 'x' + s + 'x' + s + 'x' + s + 'x' + s + 'x' +
+        s + 'x' + s + 'x' + s + 'x' + s + 'x' + s + 'x' + s + 'x' + s + 'x' +
+        s + 'x' + s + 'x' + s + 'x' + s + 'x' + s + 'x' + s + 'x' + s + 'x' +
+        s + 'x' + s + 'x' + s + 'x' + s + 'x' + s + 'x' + s + 'x' + s + 'x' +
+        s + 'x' + s + 'x' + s + 'x' + s + 'x' + s + 'x' + s + 'x' + s + 'x' +
+        s + 'x' + s + 'x' + s + 'x' + s + 'x' + s + 'x' + s + 'x' + s + 'x' +
+        s + 'x' + s + 'x' + s + 'x' + s + 'x' + s + 'x' + s + 'x' + s + 'x' +
+        s + 'x' + s + 'x' + s + 'x' + s + 'x' + s + 'x' + s + 'x' + s + 'x' +
+        s + 'x' + s + 'x' + s + 'x' + s + 'x' + s + 'x' + s + 'x' + s + 'x' +
+        s + 'x' + s + 'x')
+
+same = total == a + b + c == a + b + c + total
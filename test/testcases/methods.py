@@ -0,0 +1,26 @@
+class Account:
+    def __init__(self, owner):
+        self.owner = owner
+        self.balance = 0
+        self.label = owner
+        self.count = 'none' + 1
+
+    def deposit(self, amount):
+        self.balance = self.total(amount)
+        return self.balance
+
+    def total(self, amount):
+        return self.balance + amount
+
+
+class Basket:
+    def first(self):
+        return self.second(None)
+
+    def second(self, items):
+        return len(items)
+
+
+account = Account('name')
+deposited = account.deposit(5)
+basket = Basket()
@@ -0,0 +1,22 @@
+def maybe_num(x):
+    return None if x else 1
+
+
+def maybe_str(x):
+    return 'a' if x else None
+
+a = maybe_num(False)
+b = maybe_str(False)
+c = maybe_num(True)
+
+if a is not None and b is not None and c is not None:
+    both = a + c
+    text = b + 'b'
+
+if a is None or c is None:
+    pass
+else:
+    total = a + c
+
+if a is not None and (b is None or c > 1):
+    after = a + 1
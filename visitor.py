@@ -5,21 +5,61 @@ from backend import visit_expression, assign, unify_types, ExtendedContext, \
     Scope, static_evaluate, UnknownValue, NoneType, Bool, List, Instance, \
     Class, Unknown, maybe_inferences, Symbol, type_subset, Context, \
     construct_function_type, FunctionSignature, ClassEvaluator, Union, Set, \
-    Dict, Str
+    Dict, Str, declare_function_type, bind_method, get_token
+
+
+def method_order(methods):
+    """ The order to check methods in: __init__ first, because it lays out
+        the instance, and then each method after the methods that it calls
+        on self, so that their signatures are constrained by then. """
+    by_name = dict((method.name, method) for method in methods)
+    order = []
+    visited = set()     # ids of the methods, since a name can be redefined
+
+    def visit(method):
+        if id(method) in visited:
+            return
+        visited.add(id(method))
+        if len(method.args.args) > 0:
+            self_name = getattr(method.args.args[0], 'id', None)
+            called = sorted(set(
+                node.attr for node in ast.walk(method)
+                if get_token(node) == 'Attribute'
+                and get_token(node.value) == 'Name'
+                and node.value.id == self_name and node.attr in by_name))
+            for name in called:
+                visit(by_name[name])
+        order.append(method)
+
+    if '__init__' in by_name:
+        visited.add(id(by_name['__init__']))
+        order.append(by_name['__init__'])
+    for method in methods:
+        visit(method)
+    return order
 
 
 class ScopeVisitor(ast.NodeVisitor):
-    def __init__(self, filepath='', context=None, imported=[], warnings=None):
+    def __init__(self, filepath='', context=None, modules=None, warnings=None):
         ast.NodeVisitor.__init__(self)
         self._filepath = filepath
         self._warnings = Warnings(filepath) if warnings is None else warnings
         self._context = context if context is not None else Context()
-        self._imported = imported
+        self._modules = modules
         self._annotations = []
         self._class_instance = None
 
+    def __getstate__(self):
+        # a pickled visitor only needs to evaluate function bodies again,
+        # so drop the warnings and modules of the analysis that created it
+        state = self.__dict__.copy()
+        state['_warnings'] = Warnings(self._filepath)
+        state['_modules'] = None
+        state['_annotations'] = []
+        return state
+
     def clone(self):
-        return ScopeVisitor(self._filepath, self.context(), self._imported)
+        return ScopeVisitor(self._filepath, self.context(), self._modules)
 
     def scope(self):
         return self._context.get_top_scope()
@@ -72,12 +112,19 @@ class ScopeVisitor(ast.NodeVisitor):
                     self.warn('type-change', node, details)
 
     def visit_ClassDef(self, node):
-        # ignore warnings on the first pass because we don't have an
-        # instance to pass in as "self"
-        visitor = ScopeVisitor(self._filepath, self.context())
-        visitor.begin_scope()
-        visitor.generic_visit(node)
-        scope = visitor.end_scope()
+        # the body is visited once with the methods only declared, and then
+        # each method is checked once against an instance built from them
+        self.begin_scope()
+        methods = []
+        for stmt in node.body:
+            if get_token(stmt) == 'FunctionDef':
+                visitor = ScopeVisitor(self._filepath, self.context())
+                self._context.add(Symbol(
+                    stmt.name, declare_function_type(stmt, visitor)))
+                methods.append(stmt)
+            else:
+                self.visit(stmt)
+        scope = self.end_scope()
         if '__init__' in scope:
             signature = scope.get_type('__init__').signature
         else:
@@ -88,12 +135,32 @@ class ScopeVisitor(ast.NodeVisitor):
         class_type.evaluator = ClassEvaluator(class_type)
         self._context.add(Symbol(node.name, class_type))
 
-        # now visit the class contents to generate warnings
-        argument_scope = signature.generic_scope()
-        self._class_instance = class_type.evaluator.evaluate(argument_scope)[0]
-        self.begin_scope()
-        self.generic_visit(node)        # now all functiondefs have access
-        self.end_scope()                # to class instance to load "self"
+        instance = class_type.evaluator.instance()
+        instance.initialized = '__init__' not in scope
+        self._class_instance = instance
+        self.begin_scope(scope)
+        warnings = self._warnings
+        checked = {}    # id(method) -> (function type, warnings)
+        for method in method_order(methods):
+            self._warnings = Warnings(self._filepath)
+            try:
+                self.visit(method)      # replaces the declared method
+            finally:
+                self._warnings, method_warnings = warnings, self._warnings
+            function_type = scope.get_type(method.name)
+            checked[id(method)] = function_type, method_warnings
+            bind_method(instance, method.name, function_type)
+            if method.name == '__init__':
+                class_type.signature = function_type.signature
+                instance.initialized = True
+        # in the order of the source, where a later definition of a name
+        # replaces an earlier one
+        for method in methods:
+            function_type, method_warnings = checked[id(method)]
+            scope.add(Symbol(method.name, function_type))
+            bind_method(instance, method.name, function_type)
+            warnings.extend(method_warnings)
+        self.end_scope()
         self._class_instance = None
 
     def visit_FunctionDef(self, node):
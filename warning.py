@@ -1,6 +1,12 @@
+import os
+import json
 from backend import get_token
 
 
+SARIF_SCHEMA = ('https://docs.oasis-open.org/sarif/sarif/v2.1.0/os/schemas/'
+                'sarif-schema-2.1.0.json')
+
+
 def show_node(node):
     token = get_token(node)
     if token == 'Name':
@@ -28,26 +34,190 @@ class NodeWarning(object):
         self.node = node
         self.details = details
 
+    def record(self):
+        """ A plain dict that writers and other processes can use. The
+            column is 1-based, or None if the node has no position. """
+        column = getattr(self.node, 'col_offset', None)
+        return {
+            'file': self.filepath,
+            'line': self.node.lineno,
+            'column': column + 1 if column is not None else None,
+            'category': self.category,
+            'symbol': show_node(self.node),
+            'details': '{0}'.format(self.details) if self.details else None,
+        }
+
+    def __str__(self):
+        return format_warning(self.record())
+
+
+class FileWarning(object):
+    """ A warning about a whole file, such as one that could not be
+        analyzed, which is reported at its first line. """
+
+    def __init__(self, filepath, category, symbol, details=None):
+        self.filepath = filepath
+        self.category = category
+        self.symbol = symbol
+        self.details = details
+
+    def record(self):
+        return {
+            'file': self.filepath,
+            'line': 1,
+            'column': None,
+            'category': self.category,
+            'symbol': self.symbol,
+            'details': self.details,
+        }
+
     def __str__(self):
-        extra = ' ({0})'.format(self.details) if self.details else ''
-        return self.filepath + ':{0} {1} "{2}"{3}'.format(
-            self.node.lineno, self.category, show_node(self.node), extra)
+        return format_warning(self.record())
+
+
+def format_error(error):
+    """ The message of an exception, with the file of an OS error relative
+        to the working directory like the rest of the report. """
+    filename = getattr(error, 'filename', None)
+    if filename is not None and getattr(error, 'strerror', None):
+        return '{0}: {1}'.format(error.strerror, os.path.relpath(filename))
+    return str(error)
+
+
+def format_message(record):
+    extra = ' ({0})'.format(record['details']) if record['details'] else ''
+    return '{0} "{1}"{2}'.format(record['category'], record['symbol'], extra)
+
+
+def format_warning(record):
+    return '{0}:{1} {2}'.format(record['file'], record['line'],
+                                format_message(record))
 
 
 class Warnings(object):
-    def __init__(self, filepath):
+    """ The warnings of one module. If a writer is given, each warning is
+        passed to it as soon as it is found instead of being kept. """
+
+    def __init__(self, filepath, writer=None):
         self._filepath = filepath
+        self._writer = writer
         self._warnings = []
 
     def __len__(self):
         return len(self._warnings)
 
+    def __iter__(self):
+        return iter(self._warnings)
+
     def set_filepath(self, filepath):
         self._filepath = filepath
 
+    def _add(self, warning):
+        if self._writer is not None:
+            self._writer.write(warning.record())
+        else:
+            self._warnings.append(warning)
+
     def warn(self, node, category, details=None):
-        warning = NodeWarning(self._filepath, node, category, details)
-        self._warnings.append(warning)
+        self._add(NodeWarning(self._filepath, node, category, details))
+
+    def fail(self, error):
+        """ Report that the file could not be analyzed. """
+        self._add(FileWarning(self._filepath, 'analysis-failed',
+                              error.__class__.__name__, format_error(error)))
+
+    def extend(self, warnings):
+        for warning in warnings:
+            self.warn(warning.node, warning.category, warning.details)
+
+    def relabel(self, filepath, writer=None):
+        warnings = Warnings(filepath, writer)
+        warnings.extend(self)
+        return warnings
+
+    def records(self):
+        return [warning.record() for warning in self._warnings]
 
     def __str__(self):
         return ''.join([str(warning) + '\n' for warning in self._warnings])
+
+
+class TextWriter(object):
+    """ Writes warnings in the same format as the report of main.py. """
+
+    def __init__(self, stream):
+        self._stream = stream
+
+    def begin(self):
+        pass
+
+    def write(self, record):
+        self._stream.write(format_warning(record) + '\n')
+        self._stream.flush()
+
+    def end(self):
+        pass
+
+
+class JsonLinesWriter(object):
+    """ Writes each warning as a JSON object on its own line. """
+
+    def __init__(self, stream):
+        self._stream = stream
+
+    def begin(self):
+        pass
+
+    def write(self, record):
+        self._stream.write(json.dumps(record, sort_keys=True) + '\n')
+        self._stream.flush()
+
+    def end(self):
+        pass
+
+
+class SarifWriter(object):
+    """ Writes a SARIF 2.1.0 log with one run. The results are written as
+        they are found, and the log is closed by end(). """
+
+    def __init__(self, stream, tool_name='strictpy', tool_version=None):
+        self._stream = stream
+        self._driver = {'name': tool_name}
+        if tool_version is not None:
+            self._driver['version'] = tool_version
+        self._count = 0
+
+    def begin(self):
+        self._stream.write(
+            '{{"$schema": {0}, "version": "2.1.0", "runs": [{{"tool": '
+            '{{"driver": {1}}}, "results": [\n'.format(
+                json.dumps(SARIF_SCHEMA), json.dumps(self._driver,
+                                                     sort_keys=True)))
+
+    def write(self, record):
+        region = {'startLine': record['line']}
+        if record['column'] is not None:
+            region['startColumn'] = record['column']
+        result = {
+            'ruleId': record['category'],
+            'level': 'warning',
+            'message': {'text': format_message(record)},
+            'locations': [{'physicalLocation': {
+                'artifactLocation': {'uri': record['file']},
+                'region': region}}],
+        }
+        separator = ',\n' if self._count > 0 else ''
+        self._stream.write(separator + json.dumps(result, sort_keys=True))
+        self._stream.flush()
+        self._count += 1
+
+    def end(self):
+        self._stream.write('\n]}]}\n')
+        self._stream.flush()
+
+
+WRITERS = {
+    'text': TextWriter,
+    'jsonl': JsonLinesWriter,
+    'sarif': SarifWriter,
+}